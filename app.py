@@ -1,20 +1,120 @@
-from flask import Flask, request, render_template, redirect, url_for, flash
+from flask import Flask, Request, request, render_template, redirect, url_for, flash, jsonify, abort, Response
+from werkzeug.exceptions import RequestEntityTooLarge, UnsupportedMediaType
 from werkzeug.utils import secure_filename
+import hashlib
 import os
+import tempfile
 
-from import_utils import import_excel
+import metrics
+from import_utils import DbSession, get_pool, get_schema, import_excel, save_schema_snapshot
+from jobs import submit_upload, get_job, list_jobs, resume_job, discard_checkpoint
 
 # configuration
 UPLOAD_FOLDER = 'uploads'
-ALLOWED_EXTENSIONS = {'xlsx', 'xls'}
+# zip: one <table>.csv or <table>.parquet per sheet (see import_utils.load_table_frames)
+ALLOWED_EXTENSIONS = {'xlsx', 'xls', 'zip'}
+# leading bytes of each allowed format: xlsx is a ZIP package, xls an OLE2 compound file
+FILE_SIGNATURES = {
+    'xlsx': b'PK\x03\x04',
+    'xls': b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1',
+    'zip': b'PK\x03\x04',
+}
+# largest request body accepted, in MB
+MAX_UPLOAD_MB = int(os.environ.get('IMPORT_MAX_UPLOAD_MB', 200))
+
+
+def allowed_file(filename):
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+
+
+class UploadPart:
+    """Destination of an uploaded file while Werkzeug parses the request: the
+    chunks are written straight to a temporary file in the upload folder and
+    hashed on the way, and the first bytes are checked against the signature
+    of the file's extension, so a wrong file is rejected before the rest of
+    the body is read."""
+
+    def __init__(self, folder, ext):
+        os.makedirs(folder, exist_ok=True)
+        fd, self.path = tempfile.mkstemp(suffix='.part', dir=folder)
+        self.file = os.fdopen(fd, 'w+b')
+        self.signature = FILE_SIGNATURES[ext]
+        self.head = b''
+        self.digest = hashlib.sha256()
+
+    def write(self, data):
+        if len(self.head) < len(self.signature):
+            self.head += bytes(data[:len(self.signature) - len(self.head)])
+            if not self.signature.startswith(self.head):
+                raise UnsupportedMediaType('The file content does not match its extension')
+        self.digest.update(data)
+        return self.file.write(data)
+
+    def finish(self):
+        """Close the file and return (temporary path, sha256 hex digest)."""
+        self.file.close()
+        if self.head != self.signature:
+            raise UnsupportedMediaType('The file content does not match its extension')
+        return self.path, self.digest.hexdigest()
+
+    def discard(self):
+        self.file.close()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+    def __getattr__(self, name):
+        return getattr(self.file, name)
+
+
+class UploadRequest(Request):
+    """Request that streams uploaded workbooks into UploadParts instead of
+    Werkzeug's spooled temporary files; other extensions are rejected before
+    anything is written."""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        if not filename:
+            return super()._get_file_stream(total_content_length, content_type, filename, content_length)
+        if not allowed_file(filename):
+            raise UnsupportedMediaType('Only .xlsx, .xls or .zip files are allowed')
+        part = UploadPart(app.config['UPLOAD_FOLDER'], filename.rsplit('.', 1)[1].lower())
+        if not hasattr(self, 'upload_parts'):
+            self.upload_parts = []
+        self.upload_parts.append(part)
+        return part
+
 
 app = Flask(__name__)
+app.request_class = UploadRequest
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
+app.config['MAX_CONTENT_LENGTH'] = MAX_UPLOAD_MB * 1024 * 1024
 app.secret_key = 'supersecret-key'  # change this for production
 
 
-def allowed_file(filename):
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+@app.teardown_request
+def discard_upload_parts(exc):
+    # parts not handed to submit_upload (rejected or failed requests) are removed
+    for part in getattr(request, 'upload_parts', ()):
+        part.discard()
+
+
+def upload_error(message, status):
+    if request.accept_mimetypes.best == 'application/json':
+        return jsonify(error=message), status
+    flash(message)
+    return redirect(url_for('upload_file'))
+
+
+@app.errorhandler(RequestEntityTooLarge)
+def upload_too_large(e):
+    limit = app.config['MAX_CONTENT_LENGTH'] / (1024 * 1024)
+    return upload_error(f'The file is larger than the {limit:g} MB upload limit', 413)
+
+
+@app.errorhandler(UnsupportedMediaType)
+def upload_unsupported(e):
+    return upload_error(e.description, 415)
 
 
 @app.route('/', methods=['GET', 'POST'])
@@ -31,17 +131,115 @@ def upload_file():
             return redirect(request.url)
         if file and allowed_file(file.filename):
             filename = secure_filename(file.filename)
-            os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
-            save_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-            file.save(save_path)
-
-            try:
-                import_excel(save_path)
-                flash('Import completed successfully')
-            except Exception as e:
-                flash(f'Import failed: {e}')
-            return redirect(url_for('upload_file'))
-    return render_template('upload.html')
+            # written and hashed while the request was parsed; the job reads it in place
+            part_path, digest = file.stream.finish()
+            # an exact re-upload is answered with the earlier job unless forced
+            force = request.form.get('force', '').lower() in ('1', 'true', 'on', 'yes')
+            profile = request.form.get('profile', '').lower() in ('1', 'true', 'on', 'yes')
+            job_id, duplicate = submit_upload(part_path, filename, digest, app.config['UPLOAD_FOLDER'],
+                                              force, profile)
+            if request.accept_mimetypes.best == 'application/json':
+                return jsonify(job_id=job_id, duplicate=duplicate,
+                               status_url=url_for('job_status', job_id=job_id)), 200 if duplicate else 202
+            if duplicate:
+                flash(f'{filename} was already uploaded; showing the earlier import', 'success')
+            else:
+                flash(f'Import of {filename} queued', 'success')
+            return redirect(url_for('upload_file', job=job_id))
+    return render_template('upload.html', job_id=request.args.get('job'))
+
+
+@app.route('/validate', methods=['POST'])
+def validate_upload():
+    """Dry-run an uploaded workbook against the schema snapshot, without the
+    database or a job slot; 422 if rows would be dropped or fail to convert."""
+    file = request.files.get('file')
+    if file is None or file.filename == '' or not allowed_file(file.filename):
+        return jsonify(error='Upload an .xlsx, .xls or .zip file as "file"'), 400
+    part_path, _ = file.stream.finish()
+    # the part is removed with the request (discard_upload_parts)
+    try:
+        summary = import_excel(part_path, dry_run=True)
+    except FileNotFoundError as e:
+        return jsonify(error=f'No schema snapshot: {e}'), 503
+    except Exception as e:
+        return jsonify(error=str(e), valid=False), 422
+    summary['source'] = secure_filename(file.filename)
+    valid = not any(data['rows_dropped_fk'] or data['conversion_failures'] for data in summary['sheets'].values())
+    return jsonify(dict(summary, valid=valid)), 200 if valid else 422
+
+
+@app.route('/jobs')
+def jobs_index():
+    return jsonify(jobs=list_jobs())
+
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    job = get_job(job_id)
+    if job is None:
+        abort(404)
+    return jsonify(job)
+
+
+@app.route('/jobs/<job_id>/resume', methods=['POST'])
+def job_resume(job_id):
+    resumed = resume_job(job_id)
+    if resumed is None:
+        abort(404)
+    if not resumed:
+        return jsonify(error='Only failed jobs whose file is still uploaded can be resumed'), 409
+    return jsonify(job_id=job_id, status_url=url_for('job_status', job_id=job_id)), 202
+
+
+@app.route('/jobs/<job_id>/discard', methods=['POST'])
+def job_discard(job_id):
+    discarded = discard_checkpoint(job_id)
+    if discarded is None:
+        abort(404)
+    if not discarded:
+        return jsonify(error='Only failed jobs have checkpoints to discard'), 409
+    return jsonify(job_id=job_id, checkpoint={})
+
+
+@app.route('/health')
+def health():
+    # borrows a pooled connection, so a healthy response also warms the pool
+    try:
+        session = DbSession()
+        try:
+            session.cursor.execute("SELECT 1")
+            session.cursor.fetchall()
+        finally:
+            session.close()
+    except Exception as e:
+        return jsonify(status='error', error=str(e), pool=get_pool().metrics()), 503
+    return jsonify(status='ok', pool=get_pool().metrics())
+
+
+@app.route('/db/pool')
+def pool_metrics():
+    return jsonify(get_pool().metrics())
+
+
+@app.route('/db/schema/snapshot', methods=['POST'])
+def schema_snapshot():
+    snapshot = save_schema_snapshot()
+    return jsonify(created=snapshot['created'], tables=sorted(snapshot['tables']),
+                   ids={key: len(values) for key, values in snapshot['ids'].items()})
+
+
+@app.route('/db/schema/invalidate', methods=['POST'])
+def schema_invalidate():
+    # after a migration: the next import reads the table definitions again
+    get_schema().invalidate()
+    return jsonify(status='ok')
+
+
+@app.route('/metrics')
+def prometheus_metrics():
+    return Response(metrics.prometheus_text(pool=get_pool().metrics()),
+                    content_type='text/plain; version=0.0.4; charset=utf-8')
 
 
 if __name__ == '__main__':
@@ -0,0 +1,203 @@
+"""Import a directory or glob of course exports from the command line.
+
+    python batch_import.py exports/ --workers 4
+    python batch_import.py "exports/2023-*.xlsx" more/course.zip --dry-run --schema schema_snapshot.json
+
+Every argument is a directory (its workbooks and table files, by name), a glob
+or a file; they are imported one after another, in that order.  With workers,
+the next few files (--lookahead) are read and their content cells converted in
+worker processes while the current one is written, so parsing overlaps the
+database work.  Writes stay serial across files because a later export may
+reference courses, modules or lessons written by an earlier one, and each
+file's sheets are written in dependency order as in the web UI.
+
+Prints one line per file and a throughput summary, and exits with 1 if any
+file failed (2 if nothing matched), so it can run from cron.  Checkpoints,
+incremental mode, metrics files and the other IMPORT_* settings work as for
+import_excel.
+"""
+import argparse
+import glob
+import logging
+import os
+import sys
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+import import_utils
+from import_utils import (ConversionCache, TABLE_EXTENSIONS, conversion_workers, file_digest, import_excel,
+                          preconvert_frames, read_frames)
+
+logger = logging.getLogger(__name__)
+
+# files a directory argument expands to
+INPUT_EXTENSIONS = (".xlsx", ".xls", ".zip") + TABLE_EXTENSIONS
+# files prepared ahead of the one being written; each is held whole in memory until written
+LOOKAHEAD = 2
+
+
+def find_inputs(patterns):
+    """Files to import, in argument order: a directory gives its INPUT_EXTENSIONS
+    files sorted by name, a glob its matches sorted, anything else itself (so a
+    missing file is reported as a failure).  A file listed twice is kept once."""
+    paths = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            paths.extend(os.path.join(pattern, name) for name in sorted(os.listdir(pattern))
+                         # ~$ files are the lock files Excel leaves next to open workbooks
+                         if name.lower().endswith(INPUT_EXTENSIONS) and not name.startswith("~$")
+                         and os.path.isfile(os.path.join(pattern, name)))
+        elif any(c in pattern for c in "*?["):
+            paths.extend(sorted(p for p in glob.glob(pattern, recursive=True) if os.path.isfile(p)))
+        else:
+            paths.append(pattern)
+    return list(OrderedDict.fromkeys(paths))
+
+
+def prepare_file(path, engine=None, digest=True):
+    """Read one file and convert its content cells; runs in a worker process.
+    Returns (frames, ConversionCache entries, SHA-256 or None, seconds)."""
+    start = time.perf_counter()
+    frames = read_frames(path, engine)
+    entries = preconvert_frames(frames)
+    return frames, entries, file_digest(path) if digest else None, time.perf_counter() - start
+
+
+def import_prepared(path, prepared, options):
+    frames, entries, digest, _ = prepared
+    cache = ConversionCache(max_size=max(import_utils.CONVERT_CACHE_SIZE, len(entries)))
+    try:
+        cache.put_many(entries)
+        # every cell is converted already, so no conversion pool is started
+        return import_excel(path, frames=frames, cache=cache, digest=digest, convert_workers=0, **options)
+    finally:
+        cache.close()
+
+
+def import_files(paths, workers=0, lookahead=LOOKAHEAD, stop_on_error=False, report=None, **options):
+    """Import paths in order with import_excel(path, **options) and return one
+    result per file: {"path", "status" ("succeeded", "failed" or "skipped"),
+    "error", "summary", "prepare"}.
+
+    With workers > 0, the following lookahead files are prepared (prepare_file)
+    in up to that many worker processes while the current one is written, so
+    at most lookahead + 1 prepared files are held at a time.  A failed file
+    does not stop the batch unless stop_on_error is set; the rest are then
+    "skipped".  report(result) is called as each file finishes."""
+    digest = bool(import_utils.CHECKPOINT_PATH) and not options.get("dry_run")
+    workers = min(workers, lookahead + 1)
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 0 else None
+    futures = {}
+    results = []
+    try:
+        for i, path in enumerate(paths):
+            if executor is not None:
+                # keep the next files preparing while this one is written
+                for j in range(i, min(i + 1 + lookahead, len(paths))):
+                    if j not in futures:
+                        futures[j] = executor.submit(prepare_file, paths[j], options.get("engine"), digest)
+            result = {"path": path, "status": "succeeded", "error": None, "summary": None, "prepare": None}
+            try:
+                if executor is None:
+                    result["summary"] = import_excel(path, **options)
+                else:
+                    prepared = futures.pop(i).result()
+                    result["prepare"] = round(prepared[3], 4)
+                    result["summary"] = import_prepared(path, prepared, options)
+            except Exception as e:
+                logger.exception(f"Import of {path} failed")
+                result.update(status="failed", error=str(e) or type(e).__name__)
+            results.append(result)
+            if report is not None:
+                report(result)
+            if result["status"] == "failed" and stop_on_error:
+                for rest in paths[i + 1:]:
+                    results.append({"path": rest, "status": "skipped", "error": None, "summary": None,
+                                    "prepare": None})
+                    if report is not None:
+                        report(results[-1])
+                break
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+    return results
+
+
+def summary_rows(summary, counter):
+    if summary is None:
+        return 0
+    return sum(sheet[counter] for sheet in summary["sheets"].values())
+
+
+def print_result(result, out=sys.stdout):
+    if result["status"] == "skipped":
+        print(f"skipped  {result['path']}", file=out)
+        return
+    if result["status"] == "failed":
+        print(f"FAILED   {result['path']}: {result['error']}", file=out)
+        return
+    summary = result["summary"]
+    prepare = f", prepared in {result['prepare']:.1f}s" if result["prepare"] is not None else ""
+    print(f"ok       {result['path']}: {summary_rows(summary, 'rows_in')} rows in, "
+          f"{summary_rows(summary, 'rows_out')} out in {summary['duration']:.1f}s{prepare}", file=out)
+
+
+def print_totals(results, elapsed, dry_run=False, out=sys.stdout):
+    counts = {status: sum(1 for r in results if r["status"] == status) for status in ("succeeded", "failed", "skipped")}
+    done = [r for r in results if r["summary"] is not None]
+    rows_in = sum(summary_rows(r["summary"], "rows_in") for r in done)
+    rows_out = sum(summary_rows(r["summary"], "rows_out") for r in done)
+    minutes = elapsed / 60
+    print(f"{'dry run' if dry_run else 'import'}: {len(results)} files ({counts['succeeded']} succeeded, "
+          f"{counts['failed']} failed, {counts['skipped']} skipped)", file=out)
+    print(f"rows:     {rows_in} in, {rows_out} out", file=out)
+    print(f"time:     {elapsed:.1f}s ({len(done) / minutes if minutes else 0:.1f} files/min, "
+          f"{rows_in / elapsed if elapsed else 0:.0f} rows/s)", file=out)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("inputs", nargs="+", help="directories, globs or files (.xlsx, .xls, .zip, .csv, .parquet)")
+    parser.add_argument("--workers", default="auto",
+                        help="processes preparing upcoming files (\"auto\" = all available cores, 0 = none); "
+                             "at most lookahead + 1 are used")
+    parser.add_argument("--lookahead", type=int, default=LOOKAHEAD,
+                        help=f"files prepared ahead of the one being written (default {LOOKAHEAD}); each is held "
+                             f"in memory until written")
+    parser.add_argument("--sheet-workers", type=int, default=None, help="default: IMPORT_SHEET_WORKERS")
+    parser.add_argument("--engine", default=None, help="workbook reader (auto, calamine, openpyxl); "
+                                                       "default: IMPORT_EXCEL_ENGINE")
+    parser.add_argument("--bulk", action=argparse.BooleanOptionalAction, default=None,
+                        help="LOAD DATA LOCAL INFILE; default: IMPORT_BULK_LOAD")
+    parser.add_argument("--incremental", action=argparse.BooleanOptionalAction, default=None,
+                        help="skip unchanged rows; default: IMPORT_INCREMENTAL")
+    parser.add_argument("--resume", action=argparse.BooleanOptionalAction, default=None,
+                        help="continue files that failed before from their checkpoints; --no-resume discards "
+                             "them and starts over (default: IMPORT_RESUME)")
+    parser.add_argument("--dry-run", action="store_true", help="validate against a schema snapshot, write nothing")
+    parser.add_argument("--schema", default=None, help="dry run: schema snapshot (default: IMPORT_SCHEMA_SNAPSHOT)")
+    parser.add_argument("--stop-on-error", action="store_true", help="skip the remaining files after a failure")
+    parser.add_argument("-q", "--quiet", action="store_true", help="only log warnings and errors")
+    args = parser.parse_args(argv)
+
+    paths = find_inputs(args.inputs)
+    if not paths:
+        parser.error(f"no workbooks or table files in {' '.join(args.inputs)}")
+    if args.quiet:
+        logging.getLogger().setLevel(logging.WARNING)
+    workers = min(conversion_workers(args.workers), max(len(paths) - 1, 0))
+    options = {"sheet_workers": args.sheet_workers, "engine": args.engine, "bulk": args.bulk,
+               "incremental": args.incremental, "resume": args.resume}
+    if args.dry_run:
+        options.update(dry_run=True, schema=args.schema)
+
+    start = time.perf_counter()
+    results = import_files(paths, workers, max(args.lookahead, 0), stop_on_error=args.stop_on_error,
+                           report=print_result, **options)
+    print_totals(results, time.perf_counter() - start, args.dry_run)
+    return 0 if all(r["status"] == "succeeded" for r in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
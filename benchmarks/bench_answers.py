@@ -0,0 +1,56 @@
+"""Benchmark the answer_data decoder against the phpserialize path.
+
+    python benchmarks/bench_answers.py --rows 50000 --multibyte 0.2
+
+Builds PHP-serialized MCQ answer lists as found in course exports (some with
+multibyte or quoted option texts), converts them with convert_answer_data and
+with the phpserialize / regex fallback path it replaces, and prints the timings.
+That both give the same options is checked by tests/test_answer_data.py.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from import_utils import _phpserialize_answer_data, convert_answer_data  # noqa: E402
+from synthetic import synthetic_answer_data, synthetic_option_texts  # noqa: E402
+
+
+def fallback_answer_data(s):
+    return _phpserialize_answer_data(s, {"questionType": "MCQ", "totalPoints": 0, "options": []})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--multibyte", type=float, default=0.2, help="share of lists with non-ASCII option texts")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    lists = []
+    for _ in range(args.rows):
+        texts = synthetic_option_texts(rng, rng.randint(2, 5), rng.random() < args.multibyte)
+        lists.append(synthetic_answer_data(rng, texts=texts))
+
+    start = time.perf_counter()
+    for s in lists:
+        convert_answer_data(s)
+    decoder_s = time.perf_counter() - start
+    start = time.perf_counter()
+    for s in lists:
+        fallback_answer_data(s)
+    fallback_s = time.perf_counter() - start
+
+    print(f"lists:    {len(lists)} ({sum(1 for s in lists if not s.isascii())} multibyte)")
+    print(f"decoder:  {decoder_s:.2f}s ({len(lists) / decoder_s:.0f} lists/s)")
+    print(f"fallback: {fallback_s:.2f}s ({len(lists) / fallback_s:.0f} lists/s)")
+    print(f"speedup:  {fallback_s / decoder_s:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Benchmark serial vs process-pool content conversion.
+
+    python benchmarks/bench_convert.py --rows 20000 --workers auto
+
+Builds a frame of synthetic HTML cells, converts it with convert_columns()
+serially and with a process pool, checks both outputs are identical and
+prints the timings and speedup.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import import_utils  # noqa: E402
+from import_utils import (  # noqa: E402
+    HTML_ENGINES,
+    content_cell_json,
+    convert_columns,
+    conversion_workers,
+    make_convert_pool,
+)
+
+
+def synthetic_html(rng, paragraphs):
+    parts = ["<!-- wp:paragraph -->"]
+    for i in range(paragraphs):
+        kind = rng.random()
+        if kind < 0.15:
+            parts.append(f"<h2>Section {i} heading</h2>")
+        elif kind < 0.3:
+            items = "".join(f"<li>Item {j} with <strong>bold</strong> text</li>" for j in range(rng.randint(2, 6)))
+            parts.append(f"<ul>{items}</ul>")
+        else:
+            parts.append(
+                f"<p>Paragraph {i} lorem ipsum dolor sit amet, "
+                f'<a href="https://example.com/{i}">link {i}</a> consectetur <em>adipiscing</em> elit.</p>'
+            )
+    parts.append("<!-- /wp:paragraph -->")
+    return "".join(parts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--paragraphs", type=int, default=8, help="blocks per HTML cell")
+    parser.add_argument("--workers", default="auto")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--engine", choices=sorted(HTML_ENGINES), help="HTML engine (default: IMPORT_HTML_ENGINE)")
+    args = parser.parse_args()
+    if args.engine:
+        # Set before the pool starts so worker processes pick the same engine
+        os.environ["IMPORT_HTML_ENGINE"] = args.engine
+        import_utils.HTML_ENGINE = args.engine
+
+    rng = random.Random(args.seed)
+    df = pd.DataFrame({
+        "lesson_content": [synthetic_html(rng, args.paragraphs) for _ in range(args.rows)],
+        "question_content": [synthetic_html(rng, max(1, args.paragraphs // 2)) for _ in range(args.rows)],
+    })
+    jobs = [("lesson_content", content_cell_json), ("question_content", content_cell_json)]
+
+    start = time.perf_counter()
+    serial = convert_columns(df.copy(), jobs)
+    serial_s = time.perf_counter() - start
+
+    workers = conversion_workers(args.workers)
+    pool = make_convert_pool(workers)
+    try:
+        start = time.perf_counter()
+        parallel = convert_columns(df.copy(), jobs, pool)
+        parallel_s = time.perf_counter() - start
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    identical = all(serial[c].tolist() == parallel[c].tolist() for c, _ in jobs)
+    cells = args.rows * len(jobs)
+    print(f"engine:   {import_utils.HTML_ENGINE}")
+    print(f"cells:    {cells}")
+    print(f"serial:   {serial_s:.2f}s ({cells / serial_s:.0f} cells/s)")
+    print(f"parallel: {parallel_s:.2f}s ({cells / parallel_s:.0f} cells/s, {workers} workers)")
+    print(f"speedup:  {serial_s / parallel_s:.2f}x")
+    print(f"identical output: {identical}")
+    return 0 if identical else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,163 @@
+"""Benchmark import_excel end to end on synthetic workbooks.
+
+    python benchmarks/bench_import.py --rows 1000,10000,100000 --out results.jsonl
+    python benchmarks/bench_import.py --rows 10000 --db mysql --create-schema
+
+Builds (or reuses, under --workdir) a synthetic workbook per row count with
+every sheet of sheet_order, imports it with import_excel and writes one JSON
+line per run: wall time, rows per second, time per stage, round trips and
+bytes sent (from the import's metrics summary), plus the commit it ran on.
+``--db fake`` (default) answers the statements in process and records them;
+``--db mysql`` imports into the database configured by the DB_* variables.
+"""
+import argparse
+import datetime
+import json
+import logging
+import os
+import subprocess
+import sys
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import import_utils  # noqa: E402
+import metrics  # noqa: E402
+from synthetic import FakeDatabase, schema_statements, write_workbook  # noqa: E402
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def workbook_for(workdir, rows, paragraphs, seed):
+    path = os.path.join(workdir, f"synthetic_{rows}_p{paragraphs}_s{seed}.xlsx")
+    if not os.path.exists(path):
+        start = time.perf_counter()
+        sizes = write_workbook(path + ".tmp.xlsx", rows, paragraphs, seed)
+        os.replace(path + ".tmp.xlsx", path)
+        print(f"generated {path} ({sum(sizes.values())} rows) in {time.perf_counter() - start:.1f}s",
+              file=sys.stderr)
+    return path
+
+
+def stage_totals(summary):
+    totals = dict((f"workbook_{k}", v) for k, v in summary["stages"].items())
+    counts = dict.fromkeys(metrics.SHEET_COUNTERS, 0)
+    for data in summary["sheets"].values():
+        for stage, seconds in data["stages"].items():
+            totals[stage] = round(totals.get(stage, 0.0) + seconds, 4)
+        for name in counts:
+            counts[name] += data[name]
+    return totals, counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", default="1000,10000", help="comma-separated total row counts, e.g. 1000,10000,100000,1000000")
+    parser.add_argument("--paragraphs", type=int, default=8, help="HTML blocks per lesson cell")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=1, help="imports per row count")
+    parser.add_argument("--workdir", default=os.path.join("benchmarks", "data"), help="where workbooks are kept")
+    parser.add_argument("--db", choices=("fake", "mysql"), default="fake")
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="fake db: milliseconds slept per statement and commit")
+    parser.add_argument("--create-schema", action="store_true",
+                        help="mysql: DROP and CREATE the synthetic tables first (scratch databases only)")
+    parser.add_argument("--bulk", action="store_true", help="import with LOAD DATA LOCAL INFILE")
+    parser.add_argument("--chunk-size", type=int, default=0)
+    parser.add_argument("--convert-workers", default="0")
+    parser.add_argument("--sheet-workers", type=int, default=import_utils.SHEET_WORKERS)
+    parser.add_argument("--engine", choices=sorted(import_utils.HTML_ENGINES), help="HTML engine")
+    parser.add_argument("--excel-engine", choices=("auto", "calamine", "openpyxl"),
+                        help="workbook reader (default: IMPORT_EXCEL_ENGINE)")
+    parser.add_argument("--out", help="append JSON lines here instead of printing them")
+    parser.add_argument("--verbose", action="store_true", help="keep the importer's INFO logging")
+    args = parser.parse_args()
+
+    if not args.verbose:
+        logging.getLogger().setLevel(logging.WARNING)
+    if args.engine:
+        # Set before the pool starts so worker processes pick the same engine
+        os.environ["IMPORT_HTML_ENGINE"] = args.engine
+        import_utils.HTML_ENGINE = args.engine
+    # no metrics files, conversion cache or checkpoints on disk (incremental is off too): every run starts cold
+    metrics.METRICS_DIR = ""
+    import_utils.CONVERT_CACHE_PATH = ""
+    import_utils.CHECKPOINT_PATH = ""
+
+    fake = None
+    if args.db == "fake":
+        fk_columns = {(rule[2], rule[3]) for rule in import_utils.FK_RULES}
+        fake = FakeDatabase(args.latency / 1000.0, fk_columns)
+        import_utils.get_connection = fake.connect
+    elif args.create_schema:
+        print(f"recreating synthetic tables in {import_utils.DB_NAME} on {import_utils.DB_HOST}", file=sys.stderr)
+        session = import_utils.DbSession()
+        try:
+            for statement in schema_statements():
+                session.cursor.execute(statement)
+            session.commit()
+        finally:
+            session.close()
+
+    revision = git_revision()
+    out = open(args.out, "a", encoding="utf-8") if args.out else sys.stdout
+    try:
+        for rows in [int(r) for r in args.rows.split(",") if r.strip()]:
+            path = workbook_for(args.workdir, rows, args.paragraphs, args.seed)
+            for run in range(args.repeat):
+                start = time.perf_counter()
+                summary = import_utils.import_excel(
+                    path, bulk=args.bulk, chunk_size=args.chunk_size, convert_workers=args.convert_workers,
+                    sheet_workers=args.sheet_workers, incremental=False, engine=args.excel_engine,
+                )
+                seconds = time.perf_counter() - start
+                stages, counts = stage_totals(summary)
+                result = {
+                    "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+                    "revision": revision,
+                    "rows": rows,
+                    "rows_in": counts["rows_in"],
+                    "rows_out": counts["rows_out"],
+                    "run": run,
+                    "db": args.db,
+                    "options": {
+                        "bulk": args.bulk, "chunk_size": args.chunk_size, "convert_workers": args.convert_workers,
+                        "sheet_workers": args.sheet_workers, "engine": import_utils.HTML_ENGINE,
+                        "excel_engine": import_utils.excel_engine(args.excel_engine) or "openpyxl",
+                        "paragraphs": args.paragraphs, "latency_ms": args.latency,
+                    },
+                    "seconds": round(seconds, 4),
+                    "rows_per_second": round(counts["rows_in"] / seconds, 1) if seconds else None,
+                    "stages": stages,
+                    "round_trips": counts["round_trips"],
+                    "bytes_sent": counts["bytes_sent"],
+                    "rows_dropped_fk": counts["rows_dropped_fk"],
+                    # peak of the whole benchmark process so far (ru_maxrss is KiB on Linux)
+                    "max_rss_mb": (round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+                                   if resource is not None else None),
+                }
+                if fake is not None:
+                    result["statements"] = dict(fake.statements)
+                    fake.statements.clear()
+                print(json.dumps(result), file=out, flush=True)
+                print(f"{rows} rows: {seconds:.2f}s ({result['rows_per_second']} rows/s)", file=sys.stderr)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,341 @@
+"""Synthetic course workbooks and an in-process database stand-in for benchmarks.
+
+write_workbook() builds an .xlsx with every sheet of import_utils.sheet_order,
+shaped like a real course export (HTML content, PHP-serialized MCQ
+answer_data, ids that satisfy FK_RULES).  FakeConnection answers the
+statements import_excel sends from memory and records them, so an import can
+be timed without a MySQL server.
+"""
+import datetime
+import os
+import random
+import re
+import threading
+import time
+from collections import Counter, OrderedDict
+
+import openpyxl
+
+BIGINT = "BIGINT"
+TEXT = "LONGTEXT"
+DATE = "DATETIME"
+SHORT = "VARCHAR(64)"
+
+# sheet -> [(column, MySQL type)] in workbook order
+SHEETS = OrderedDict([
+    ("editors", [("editor_id", BIGINT), ("editor_name", TEXT), ("editor_email", TEXT),
+                 ("first_name", TEXT), ("last_name", TEXT)]),
+    ("categories", [("category_id", BIGINT), ("category_title", TEXT), ("category_description", TEXT)]),
+    ("subcategories", [("subcategory_id", BIGINT), ("category_id", BIGINT), ("subcategory_name", TEXT),
+                       ("subcategory_description", TEXT)]),
+    ("topic_categories", [("topic_id", BIGINT), ("subcategory_id", BIGINT), ("topic_name", TEXT),
+                          ("topic_description", TEXT), ("short_code", SHORT)]),
+    ("courses", [("course_id", BIGINT), ("topic_id", BIGINT), ("created_by", BIGINT), ("publish_date", DATE),
+                 ("course_description", TEXT), ("course_title", TEXT), ("status", SHORT), ("slug", TEXT),
+                 ("last_update", DATE)]),
+    ("modules", [("module_id", BIGINT), ("module_name", TEXT), ("module_description", TEXT),
+                 ("course_id", BIGINT), ("menu_order", BIGINT), ("status", SHORT), ("created_by", BIGINT),
+                 ("publish_date", DATE), ("last_update", DATE)]),
+    ("lessons", [("lesson_id", BIGINT), ("created_by", BIGINT), ("publish_date", DATE), ("lesson_content", TEXT),
+                 ("lesson_name", TEXT), ("status", SHORT), ("slug", TEXT), ("last_update", DATE),
+                 ("video_url", TEXT)]),
+    ("assessments", [("assessment_id", BIGINT), ("created_by", BIGINT), ("publish_date", DATE),
+                     ("assessment_content", TEXT), ("assessment_name", TEXT), ("status", SHORT),
+                     ("last_update", DATE)]),
+    ("module_contents", [("content_id", BIGINT), ("module_id", BIGINT), ("content_type", SHORT),
+                         ("lesson_id", BIGINT), ("assessment_id", BIGINT), ("menu_order", BIGINT)]),
+    ("questions", [("question_id", BIGINT), ("created_by", BIGINT), ("publish_date", DATE),
+                   ("question_content", TEXT), ("question_title", TEXT), ("status", SHORT),
+                   ("correct_msg", TEXT), ("incorrect_msg", TEXT), ("answer_type", SHORT),
+                   ("answer_data", TEXT), ("assessment_id", BIGINT)]),
+    ("question_links", [("question_id", BIGINT), ("assessment_id", BIGINT)]),
+])
+
+# sheet -> primary key columns
+KEYS = {sheet: [columns[0][0]] for sheet, columns in SHEETS.items()}
+KEYS["question_links"] = ["question_id", "assessment_id"]
+
+# share of the requested row count per sheet (the small lookup sheets are fixed)
+SHARES = {"modules": 0.05, "lessons": 0.15, "assessments": 0.05, "questions": 0.25, "question_links": 0.25}
+FIXED = {"editors": 10, "categories": 5, "subcategories": 20, "topic_categories": 40}
+# Excel's row limit, minus the header
+MAX_SHEET_ROWS = 1048575
+
+
+def sheet_sizes(rows):
+    """Rows per sheet for a workbook of about rows rows in total."""
+    sizes = dict(FIXED)
+    for sheet, share in SHARES.items():
+        sizes[sheet] = max(1, int(rows * share))
+    sizes["courses"] = max(1, sizes["modules"] // 10)
+    # one module_contents row per lesson and assessment
+    sizes["module_contents"] = sizes["lessons"] + sizes["assessments"]
+    for sheet, size in sizes.items():
+        if size > MAX_SHEET_ROWS:
+            raise ValueError(f"{sheet} would need {size} rows; an .xlsx sheet holds at most {MAX_SHEET_ROWS}")
+    return OrderedDict((sheet, sizes[sheet]) for sheet in SHEETS)
+
+
+def synthetic_html(rng, paragraphs):
+    parts = []
+    for i in range(paragraphs):
+        kind = rng.random()
+        if kind < 0.15:
+            parts.append(f"<!-- wp:heading -->\n<h2>Section {i} heading</h2>\n<!-- /wp:heading -->")
+        elif kind < 0.3:
+            items = "".join(f"<!-- wp:list-item -->\n<li>Item {j} with <strong>bold</strong> text</li>\n"
+                            f"<!-- /wp:list-item -->" for j in range(rng.randint(2, 6)))
+            parts.append(f'<!-- wp:list -->\n<ul class="wp-block-list">{items}</ul>\n<!-- /wp:list -->')
+        else:
+            parts.append(
+                f"<!-- wp:paragraph -->\n<p>Paragraph {i} lorem ipsum dolor sit amet, "
+                f'<a href="https://example.com/{rng.randint(1, 10 ** 6)}">link</a> consectetur '
+                f"<em>adipiscing</em> elit {rng.randint(1, 10 ** 6)}.</p>\n<!-- /wp:paragraph -->"
+            )
+    return "\n\n".join(parts)
+
+
+def _php_str(s):
+    return f's:{len(s.encode("utf-8"))}:"{s}";'
+
+
+MULTIBYTE_WORDS = ["Größe", "café", "日本語", "naïve", "Ελληνικά", "emoji 😀", '"quoted"']
+
+
+def synthetic_option_texts(rng, options, multibyte=False):
+    """MCQ option texts; with multibyte, each has non-ASCII or quoted words."""
+    texts = []
+    for i in range(options):
+        words = [f"Answer option {i}"]
+        if multibyte:
+            words += rng.sample(MULTIBYTE_WORDS, 2)
+        texts.append(" ".join(words) + f" number {rng.randint(1, 10 ** 6)}.")
+    return texts
+
+
+def synthetic_answer_data(rng, options=4, texts=None):
+    """WpProQuiz answer list as found in course exports (the protected property
+    names lost their NUL bytes, so their declared lengths are off by two).
+    texts, if given, are the option texts."""
+    if texts is not None:
+        options = len(texts)
+    correct = rng.randrange(options)
+    parts = []
+    for i in range(options):
+        text = texts[i] if texts is not None else f"Answer option {i} number {rng.randint(1, 10 ** 6)}."
+        parts.append(
+            f'i:{i};O:27:"WpProQuiz_Model_AnswerTypes":10:{{s:10:"*_mapper";N;s:10:"*_answer";'
+            f'{_php_str(text)}s:8:"*_html";b:0;'
+            f's:10:"*_points";d:0;s:11:"*_correct";b:{int(i == correct)};s:14:"*_sortString";s:0:"";'
+            f's:18:"*_sortStringHtml";b:0;s:10:"*_graded";b:0;s:22:"*_gradingProgression";'
+            f's:15:"not-graded-none";s:14:"*_gradedType";N;}}'
+        )
+    return f"a:{options}:{{{''.join(parts)}}}"
+
+
+def _sheet_rows(sheet, sizes, rng, paragraphs):
+    base = datetime.datetime(2025, 1, 1)
+
+    def when(i):
+        return base + datetime.timedelta(minutes=i)
+
+    editors = range(1, sizes["editors"] + 1)
+    n = sizes[sheet]
+    if sheet == "editors":
+        for i in editors:
+            yield [i, f"editor{i}", f"editor{i}@example.com", f"First{i}", f"Last{i}"]
+    elif sheet == "categories":
+        for i in range(1, n + 1):
+            yield [i, f"Category {i}", f"Description of category {i}"]
+    elif sheet == "subcategories":
+        for i in range(1, n + 1):
+            yield [i, rng.randint(1, sizes["categories"]), f"Subcategory {i}", f"Description {i}"]
+    elif sheet == "topic_categories":
+        for i in range(1, n + 1):
+            yield [i, rng.randint(1, sizes["subcategories"]), f"Topic {i}", f"Description {i}", f"t{i}"]
+    elif sheet == "courses":
+        for i in range(1, n + 1):
+            yield [100000 + i, rng.randint(1, sizes["topic_categories"]), rng.choice(editors), when(i),
+                   synthetic_html(rng, paragraphs), f"Course {i}", "published", f"course-{i}", when(i + 1)]
+    elif sheet == "modules":
+        for i in range(1, n + 1):
+            yield [200000 + i, f"Module {i}", synthetic_html(rng, max(1, paragraphs // 4)),
+                   100000 + rng.randint(1, sizes["courses"]), i, "published", rng.choice(editors), when(i),
+                   when(i + 1)]
+    elif sheet == "lessons":
+        for i in range(1, n + 1):
+            yield [300000 + i, rng.choice(editors), when(i), synthetic_html(rng, paragraphs), f"Lesson {i}",
+                   rng.choice(["published", "draft", 1, 0]), f"lesson-{i}", when(i + 1),
+                   f"https://vimeo.com/{rng.randint(10 ** 8, 10 ** 9)}"]
+    elif sheet == "assessments":
+        for i in range(1, n + 1):
+            yield [400000 + i, rng.choice(editors), when(i), synthetic_html(rng, max(1, paragraphs // 2)),
+                   f"Assessment {i}", "published", when(i + 1)]
+    elif sheet == "module_contents":
+        modules = sizes["modules"]
+        for i in range(1, n + 1):
+            lesson = i <= sizes["lessons"]
+            yield [500000 + i, 200000 + (i - 1) % modules + 1, "lesson" if lesson else "assessment",
+                   300000 + i if lesson else None, None if lesson else 400000 + i - sizes["lessons"], i]
+    elif sheet == "questions":
+        for i in range(1, n + 1):
+            yield [600000 + i, rng.choice(editors), when(i), synthetic_html(rng, 1), f"Q{i}", "published",
+                   "Correct!" if i % 3 else None, "Try again." if i % 3 else None, "single",
+                   synthetic_answer_data(rng, rng.randint(2, 5)), 400000 + rng.randint(1, sizes["assessments"])]
+    elif sheet == "question_links":
+        for i in range(1, n + 1):
+            yield [600000 + (i - 1) % sizes["questions"] + 1, 400000 + rng.randint(1, sizes["assessments"])]
+
+
+def write_workbook(path, rows, paragraphs=8, seed=1):
+    """Write a synthetic workbook of about rows rows to path; returns the sheet sizes."""
+    rng = random.Random(seed)
+    sizes = sheet_sizes(rows)
+    wb = openpyxl.Workbook(write_only=True)
+    for sheet, columns in SHEETS.items():
+        ws = wb.create_sheet(sheet)
+        ws.append([name for name, _ in columns])
+        for row in _sheet_rows(sheet, sizes, rng, paragraphs):
+            ws.append(row)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    wb.save(path)
+    return sizes
+
+
+def schema_statements():
+    """DROP/CREATE statements for the synthetic tables (for a scratch database)."""
+    for sheet, columns in SHEETS.items():
+        cols = ", ".join(f"`{name}` {kind} NULL" for name, kind in columns)
+        key = ", ".join(f"`{c}`" for c in KEYS[sheet])
+        yield f"DROP TABLE IF EXISTS `{sheet}`"
+        yield f"CREATE TABLE `{sheet}` ({cols}, PRIMARY KEY ({key})) DEFAULT CHARSET=utf8mb4"
+
+
+# ==========================
+# FAKE DATABASE
+# ==========================
+class FakeDatabase:
+    """In-memory stand-in for the server: keeps the key and FK columns of every
+    row written, answers the statements import_excel sends, and counts them.
+    latency seconds are slept per statement and commit to mimic a network."""
+
+    def __init__(self, latency=0.0, fk_columns=()):
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.ids = {}  # (table, column) -> set of values
+        self.tracked = {}  # table -> columns whose values are kept
+        for table, column in fk_columns:
+            self.tracked.setdefault(table, set()).add(column)
+        for table, key in KEYS.items():
+            self.tracked.setdefault(table, set()).update(key)
+        self.staged = {}  # staging table -> [(columns, path)]
+        self.statements = Counter()
+        self.rows_written = Counter()
+
+    def connect(self, local_infile=False):
+        return FakeConnection(self)
+
+    def _keep(self, table, columns, values):
+        keep = [(i, c) for i, c in enumerate(columns) if c in self.tracked.get(table, ())]
+        width = len(columns)
+        with self.lock:
+            for i, c in keep:
+                self.ids.setdefault((table, c), set()).update(
+                    int(float(v)) for v in values[i::width] if v not in (None, "", "\\N")
+                )
+            self.rows_written[table] += len(values) // width
+
+
+class FakeConnection:
+    def __init__(self, db):
+        self.db = db
+
+    def cursor(self):
+        return FakeCursor(self.db)
+
+    def commit(self):
+        if self.db.latency:
+            time.sleep(self.db.latency)
+        with self.db.lock:
+            self.db.statements["COMMIT"] += 1
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+    def is_connected(self):
+        return True
+
+
+class FakeCursor:
+    def __init__(self, db):
+        self.db = db
+        self.result = []
+        self.rowcount = 0
+
+    def execute(self, query, params=None):
+        db = self.db
+        if db.latency:
+            time.sleep(db.latency)
+        q = " ".join(query.split())
+        with db.lock:
+            db.statements[q.split(" ", 1)[0].upper()] += 1
+        self.result = []
+        self.rowcount = 0
+        m = re.match(r"SHOW COLUMNS FROM `(\w+)`", q)
+        if m:
+            # Field, Type, Null, Key, Default, Extra
+            self.result = [(name, kind.lower(), "YES", "", None, "") for name, kind in SHEETS.get(m.group(1), [])]
+            return
+        m = re.match(r"SHOW INDEX FROM `(\w+)`", q)
+        if m:
+            key = KEYS.get(m.group(1), [])
+            self.result = [(m.group(1), 0, "PRIMARY", i + 1, c) for i, c in enumerate(key)]
+            return
+        if q.startswith("SELECT @@max_allowed_packet"):
+            self.result = [(64 * 1024 * 1024,)]
+            return
+        if q.startswith("SELECT 1"):
+            self.result = [(1,)]
+            return
+        m = re.match(r"SELECT DISTINCT `(\w+)` FROM `(\w+)`( WHERE)?", q)
+        if m:
+            with db.lock:
+                present = db.ids.get((m.group(2), m.group(1)), set())
+                self.result = [(v,) for v in params if v in present] if m.group(3) else [(v,) for v in present]
+            return
+        m = re.match(r"INSERT INTO `(\w+)` \(([^)]*)\) (VALUES|SELECT .* FROM `(\w+)`)", q)
+        if m:
+            table, columns = m.group(1), [c.strip("` ") for c in m.group(2).split(",")]
+            if m.group(4):
+                for stage_columns, path in db.staged.pop(m.group(4), []):
+                    values = []
+                    with open(path, encoding="utf-8") as f:
+                        for line in f:
+                            values.extend(line.rstrip("\n").split("\t"))
+                    db._keep(table, stage_columns, values)
+            else:
+                db._keep(table, columns, list(params))
+                self.rowcount = len(params) // len(columns)
+            return
+        m = re.match(r"LOAD DATA LOCAL INFILE %s INTO TABLE `(\w+)`.*\(([^)]*)\)$", q)
+        if m:
+            columns = [c.strip("` ") for c in m.group(2).split(",")]
+            db.staged.setdefault(m.group(1), []).append((columns, params[0]))
+            with open(params[0], encoding="utf-8") as f:
+                self.rowcount = sum(1 for _ in f)
+            return
+        if q.startswith(("CREATE TEMPORARY TABLE", "DROP TEMPORARY TABLE")):
+            return
+        raise NotImplementedError(f"FakeCursor cannot answer: {q[:120]}")
+
+    def fetchall(self):
+        return self.result
+
+    def fetchone(self):
+        return self.result[0] if self.result else None
+
+    def close(self):
+        pass
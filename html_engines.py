@@ -0,0 +1,295 @@
+"""Tree-free HTML -> block JSON engines used by import_utils.html_to_block_json.
+
+Both engines here produce exactly the blocks of the BeautifulSoup ("bs4")
+engine in import_utils, without building a document tree: a BlockBuilder
+consumes start/end/text events and applies BeautifulSoup's html.parser tree
+rules (unmatched end tags are ignored, void elements close immediately, open
+tags are closed at the end) while it collects the text each block needs.
+
+- "stdlib": a single-pass tokenizer on html.parser.HTMLParser, the same
+  tokenizer BeautifulSoup's html.parser builder uses.
+- "lxml": libxml2 events through an lxml target parser.  libxml2 repairs
+  malformed markup its own way (invalid nesting such as a <ul> inside a <p>,
+  broken character references such as "&#12ab;"), so on such markup its
+  blocks can differ from the other engines; on well-formed content they match.
+"""
+from html.entities import html5
+from html.parser import HTMLParser
+
+BLOCK_TAGS = {"h1", "h2", "h3", "p", "ul", "ol"}
+
+# Tags BeautifulSoup closes as soon as they open
+VOID_ELEMENTS = {
+    "area", "base", "basefont", "bgsound", "br", "col", "command", "embed", "frame", "hr", "image",
+    "img", "input", "isindex", "keygen", "link", "menuitem", "meta", "nextid", "param", "source",
+    "spacer", "track", "wbr"
+}
+
+# Tags whose strings BeautifulSoup keeps in their own string class; get_text()
+# on any other tag skips them, get_text() on the tag itself only returns them.
+STRING_CONTAINERS = {"rt", "rp", "style", "script", "template"}
+
+# String classes get_text() returns for ordinary tags
+MAIN_STRINGS = ("text", "cdata")
+
+REPLACEMENT_CHARACTER = "\ufffd"
+
+
+class _Open:
+    __slots__ = ("name", "texts", "block")
+
+    def __init__(self, name):
+        self.name = name
+        self.texts = None
+        self.block = None
+
+
+class _Block:
+    __slots__ = ("name", "element", "children", "items")
+
+    def __init__(self, name, element):
+        self.name = name
+        self.element = element
+        self.children = []
+        self.items = []
+
+
+def _collects(element, string_class):
+    if element.name in STRING_CONTAINERS:
+        return string_class == element.name
+    return string_class in MAIN_STRINGS
+
+
+class BlockBuilder:
+    """Builds the block list from parser events (start/end/data/special/close)."""
+
+    def __init__(self):
+        self.stack = []
+        self.open_counts = {}
+        self.capturing = []
+        self.open_lists = []
+        self.containers = []
+        self.pending = []
+        self.blocks = []
+
+    def start(self, name, attrs):
+        self.flush()
+        parent = self.stack[-1] if self.stack else None
+        element = _Open(name)
+        capture = False
+        if name in BLOCK_TAGS:
+            element.block = _Block(name, element)
+            self.blocks.append(element.block)
+            capture = name not in ("ul", "ol")
+        if parent is not None and parent.block is not None and parent.block.name not in ("ul", "ol"):
+            if name == "a":
+                parent.block.children.append(("link", attrs.get("href") or "", element))
+            else:
+                parent.block.children.append(("tag", None, element))
+            capture = True
+        if name == "li" and self.open_lists:
+            for block in self.open_lists:
+                block.items.append(element)
+            capture = True
+        if capture:
+            element.texts = []
+            self.capturing.append(element)
+        self.stack.append(element)
+        self.open_counts[name] = self.open_counts.get(name, 0) + 1
+        if name in ("ul", "ol"):
+            self.open_lists.append(element.block)
+        if name in STRING_CONTAINERS:
+            self.containers.append(element)
+
+    def end(self, name):
+        self.flush()
+        if not self.open_counts.get(name):
+            return
+        while self.stack:
+            if self._pop().name == name:
+                break
+
+    def data(self, text):
+        self.pending.append(text)
+
+    def special(self, string_class, text):
+        """A comment, declaration, CDATA section or processing instruction."""
+        self.flush()
+        self._string(text, string_class)
+
+    def flush(self):
+        if self.pending:
+            text = "".join(self.pending)
+            self.pending = []
+            self._string(text, self.containers[-1].name if self.containers else "text")
+
+    def close(self):
+        self.flush()
+        while self.stack:
+            self._pop()
+        return [self._render(block) for block in self.blocks]
+
+    def _pop(self):
+        element = self.stack.pop()
+        self.open_counts[element.name] -= 1
+        if self.capturing and self.capturing[-1] is element:
+            self.capturing.pop()
+        if self.open_lists and self.open_lists[-1].element is element:
+            self.open_lists.pop()
+        if self.containers and self.containers[-1] is element:
+            self.containers.pop()
+        return element
+
+    def _string(self, text, string_class):
+        text = text.strip()
+        if not text:
+            return
+        for element in self.capturing:
+            if _collects(element, string_class):
+                element.texts.append(text)
+        top = self.stack[-1] if self.stack else None
+        if (top is not None and top.block is not None and top.block.name not in ("ul", "ol")
+                and string_class in MAIN_STRINGS):
+            top.block.children.append(("text", text, None))
+
+    @staticmethod
+    def _render(block):
+        if block.name in ("ul", "ol"):
+            return {
+                "type": "list",
+                "ordered": block.name == "ol",
+                "items": [{"text": "".join(li.texts)} for li in block.items]
+            }
+        children = []
+        for kind, value, element in block.children:
+            if kind == "link":
+                children.append({"type": "link", "url": value, "text": "".join(element.texts)})
+            elif kind == "tag":
+                text = "".join(element.texts)
+                if text:
+                    children.append({"type": "text", "text": text})
+            else:
+                children.append({"type": "text", "text": value})
+        if not children:
+            children = [{"type": "text", "text": "".join(block.element.texts) or ""}]
+        if block.name == "p":
+            return {"type": "paragraph", "children": children}
+        return {"type": "heading", "level": int(block.name[1]), "children": children}
+
+
+# ==========================
+# STDLIB ENGINE
+# ==========================
+def _numeric_reference(number):
+    """Character for a numeric reference, as BeautifulSoup resolves it."""
+    if number == 0 or number > 0x10ffff or 0xd800 <= number <= 0xdfff:
+        return REPLACEMENT_CHARACTER
+    if 0x80 <= number <= 0x9f:
+        try:
+            return bytes([number]).decode("cp1252")
+        except UnicodeDecodeError:
+            pass
+    return chr(number)
+
+
+class _BlockHTMLParser(HTMLParser):
+    """HTMLParser that forwards events to a BlockBuilder the way BeautifulSoup's
+    html.parser builder turns them into tree operations."""
+
+    def __init__(self, builder):
+        super().__init__(convert_charrefs=False)
+        self.builder = builder
+        self.already_closed = []
+
+    def handle_starttag(self, tag, attrs):
+        self.builder.start(tag, {k: "" if v is None else v for k, v in attrs})
+        if tag in VOID_ELEMENTS:
+            self.builder.end(tag)
+            self.already_closed.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        self.builder.start(tag, {k: "" if v is None else v for k, v in attrs})
+        self.builder.end(tag)
+
+    def handle_endtag(self, tag):
+        if tag in self.already_closed:
+            self.already_closed.remove(tag)
+        else:
+            self.builder.end(tag)
+
+    def handle_data(self, data):
+        self.builder.data(data)
+
+    def handle_charref(self, name):
+        base, digits = (16, "0123456789abcdef") if name[:1] in ("x", "X") else (10, "0123456789")
+        if base == 16:
+            name = name[1:]
+        try:
+            self.builder.data(_numeric_reference(int(name, base)))
+            return
+        except ValueError:
+            pass
+        end = 0
+        while end < len(name) and name[end] in digits:
+            end += 1
+        if end:
+            self.builder.data(_numeric_reference(int(name[:end], base)))
+        self.builder.data(name[end:])
+
+    def handle_entityref(self, name):
+        character = html5.get(name + ";")
+        self.builder.data(character if character is not None else "&" + name)
+
+    def handle_comment(self, data):
+        self.builder.special("comment", data)
+
+    def handle_decl(self, decl):
+        self.builder.special("doctype", decl[len("DOCTYPE "):])
+
+    def unknown_decl(self, data):
+        if data.upper().startswith("CDATA["):
+            self.builder.special("cdata", data[len("CDATA["):])
+        else:
+            self.builder.special("declaration", data)
+
+    def handle_pi(self, data):
+        self.builder.special("pi", data)
+
+
+def stdlib_blocks(html):
+    builder = BlockBuilder()
+    parser = _BlockHTMLParser(builder)
+    parser.feed(html)
+    parser.close()
+    return builder.close()
+
+
+# ==========================
+# LXML ENGINE
+# ==========================
+class _LxmlTarget:
+    def __init__(self):
+        self.builder = BlockBuilder()
+
+    def start(self, tag, attrib):
+        self.builder.start(tag, dict(attrib))
+
+    def end(self, tag):
+        self.builder.end(tag)
+
+    def data(self, data):
+        self.builder.data(data)
+
+    def comment(self, text):
+        self.builder.special("comment", text)
+
+    def close(self):
+        return self.builder.close()
+
+
+def lxml_blocks(html):
+    from lxml import etree
+
+    parser = etree.HTMLParser(target=_LxmlTarget())
+    parser.feed(html)
+    return parser.close()
@@ -1,11 +1,28 @@
 import pandas as pd
+import numpy as np
 import mysql.connector
 import re
 import phpserialize
 import json
 import logging
 from bs4 import BeautifulSoup
+import html_engines
+import metrics
 import os
+import sys
+import tempfile
+import hashlib
+import sqlite3
+import threading
+import copy
+import io
+import zipfile
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
+import time
+import datetime
+import openpyxl
+from pandas.io.parsers import TextParser
 
 # ==========================
 # LOGGING
@@ -28,14 +45,71 @@ DB_USER = os.environ.get('DB_USER', 'simuser')
 DB_PASSWORD = os.environ.get('DB_PASSWORD', 'simpoint@2026')
 DB_NAME = os.environ.get('DB_NAME', 'simpoint_db')
 PORT = int(os.environ.get('DB_PORT', 3306))
+# Connection pool shared by all imports in the process
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 10))
+# Seconds to wait for a free pooled connection before giving up
+DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', 60))
+# Pooled connections idle longer than this (seconds) are closed instead of reused
+DB_POOL_RECYCLE = float(os.environ.get('DB_POOL_RECYCLE', 300))
 
 # Batch commit every N rows to avoid long transactions and connection timeout
 BATCH_SIZE = 500
-# Max retries on lost connection (error 2013)
-MAX_RECONNECT_RETRIES = 3
-
-
-def get_connection():
+# Max replays of an uncommitted batch after the connection is lost
+MAX_RECONNECT_RETRIES = int(os.environ.get('IMPORT_RECONNECT_RETRIES', 3))
+# Seconds to wait before the first reconnect; doubled on each further attempt, up to the max
+RECONNECT_BACKOFF = float(os.environ.get('IMPORT_RECONNECT_BACKOFF', 0.5))
+RECONNECT_BACKOFF_MAX = float(os.environ.get('IMPORT_RECONNECT_BACKOFF_MAX', 8))
+# MySQL client errors after which the connection and its open transaction are gone:
+# server has gone away, lost connection during query, lost connection to server
+CONNECTION_LOST_ERRORS = (2006, 2013, 2055)
+# Fallback for max_allowed_packet when the server value cannot be read
+DEFAULT_MAX_ALLOWED_PACKET = 4 * 1024 * 1024
+# Candidate ids per "WHERE col IN (...)" FK lookup
+FK_LOOKUP_BATCH = 1000
+# Fraction of max_allowed_packet a single multi-row statement may use (room for escaping)
+PACKET_FILL_RATIO = 0.75
+# Opt-in bulk mode: LOAD DATA LOCAL INFILE into a staging table, then one INSERT ... SELECT
+BULK_LOAD = os.environ.get('IMPORT_BULK_LOAD', '').lower() in ('1', 'true', 'yes')
+# Only files inside this directory may be sent with LOAD DATA LOCAL INFILE
+BULK_STAGING_DIR = os.environ.get('BULK_STAGING_DIR', os.path.join(tempfile.gettempdir(), 'course_import_staging'))
+# Worker processes for HTML/PHP -> JSON conversion: 0 converts in-process, "auto" uses all cores
+CONVERT_WORKERS = os.environ.get('IMPORT_CONVERT_WORKERS', '0')
+# Cells per task handed to a conversion worker
+CONVERT_CHUNK = 200
+# Converted cells remembered in memory during one import (LRU)
+CONVERT_CACHE_SIZE = int(os.environ.get('IMPORT_CONVERT_CACHE_SIZE', 50000))
+# Optional SQLite file that keeps conversions across uploads; empty disables it
+CONVERT_CACHE_PATH = os.environ.get('IMPORT_CONVERT_CACHE_PATH', '')
+# Bump when a converter's output changes so persisted entries are not reused
+CONVERT_CACHE_VERSION = 5
+# HTML parser behind html_to_block_json: "bs4", "stdlib" (single-pass tokenizer) or "lxml"
+HTML_ENGINE = os.environ.get('IMPORT_HTML_ENGINE', 'bs4')
+# Reader for whole-sheet reads: "auto" (calamine if python-calamine is installed, else openpyxl),
+# "calamine" or "openpyxl"
+EXCEL_ENGINE = os.environ.get('IMPORT_EXCEL_ENGINE', 'auto')
+# Rows per chunk for the streaming (openpyxl read-only) reader; 0 reads whole sheets
+CHUNK_SIZE = int(os.environ.get('IMPORT_CHUNK_SIZE', 0))
+# Sheets imported at the same time (each on its own connection); 1 imports them one by one
+SHEET_WORKERS = int(os.environ.get('IMPORT_SHEET_WORKERS', 4))
+# Incremental mode: only rows that are new or changed since the last import are written
+INCREMENTAL = os.environ.get('IMPORT_INCREMENTAL', '').lower() in ('1', 'true', 'yes')
+# SQLite file holding the per-row fingerprints of previous imports
+FINGERPRINT_PATH = os.environ.get('IMPORT_FINGERPRINT_PATH', 'import_fingerprints.sqlite')
+# SQLite file holding per-sheet checkpoints of unfinished imports (e.g. import_checkpoints.sqlite);
+# empty (the default) disables checkpoints
+CHECKPOINT_PATH = os.environ.get('IMPORT_CHECKPOINT_PATH', '')
+# Continue an import of a file from its checkpoints instead of starting over
+RESUME = os.environ.get('IMPORT_RESUME', '1').lower() in ('1', 'true', 'yes')
+# JSON snapshot of the target schema (and referenced ids) that dry runs validate against
+SCHEMA_SNAPSHOT_PATH = os.environ.get('IMPORT_SCHEMA_SNAPSHOT', 'schema_snapshot.json')
+
+
+def get_connection(local_infile=False):
+    options = {}
+    if local_infile:
+        # restrict LOAD DATA LOCAL to our staging directory
+        os.makedirs(BULK_STAGING_DIR, exist_ok=True)
+        options['allow_local_infile_in_path'] = BULK_STAGING_DIR
     return mysql.connector.connect(
         host=DB_HOST,
         user=DB_USER,
@@ -45,13 +119,236 @@ def get_connection():
         auth_plugin='mysql_native_password',
         charset='utf8mb4',
         connection_timeout=60,
-        autocommit=False
+        autocommit=False,
+        **options
     )
 
 
+class ConnectionPool:
+    """Process-wide pool of open connections, reused across imports and uploads.
+
+    acquire() hands out the most recently released idle connection of the
+    requested kind (plain or LOAD DATA LOCAL enabled) after pinging it, or opens
+    a new one while fewer than size are open; otherwise it waits up to timeout
+    seconds for a release.  Connections idle longer than recycle seconds, or
+    failing the ping, are closed instead of reused."""
+
+    def __init__(self, size=DB_POOL_SIZE, timeout=DB_POOL_TIMEOUT, recycle=DB_POOL_RECYCLE):
+        self.size = size
+        self.timeout = timeout
+        self.recycle = recycle
+        self.idle = []  # (conn, local_infile, released at), most recent last
+        self.open = 0
+        self.cond = threading.Condition()
+        self.stats = {
+            "created": 0, "reused": 0, "waits": 0, "wait_seconds": 0.0, "timeouts": 0,
+            "stale": 0, "recycled": 0, "reconnects": 0,
+        }
+
+    def acquire(self, local_infile=False):
+        start = time.monotonic()
+        waited = False
+        while True:
+            with self.cond:
+                conn = self._take_idle(local_infile)
+                while conn is None and self.open >= self.size:
+                    if self._drop_idle():
+                        # an idle connection of the other kind made room
+                        continue
+                    remaining = start + self.timeout - time.monotonic()
+                    if remaining <= 0:
+                        self.stats["timeouts"] += 1
+                        raise mysql.connector.errors.PoolError(
+                            f"No free database connection after {self.timeout:g}s ({self.size} in use)"
+                        )
+                    if not waited:
+                        self.stats["waits"] += 1
+                        waited = True
+                    self.cond.wait(remaining)
+                    conn = self._take_idle(local_infile)
+                if conn is None:
+                    self.open += 1
+            if conn is None:
+                conn = self._connect(local_infile)
+                break
+            if self._alive(conn):
+                self._count("reused")
+                break
+            self._count("stale")
+            self.discard(conn)
+        if waited:
+            self._count("wait_seconds", time.monotonic() - start)
+        return conn
+
+    def release(self, conn, local_infile=False):
+        """Return a connection; an open transaction is rolled back first."""
+        try:
+            conn.rollback()
+        except Exception:
+            self.discard(conn)
+            return
+        with self.cond:
+            self.idle.append((conn, local_infile, time.monotonic()))
+            self.cond.notify()
+
+    def discard(self, conn):
+        """Close a borrowed connection instead of returning it (e.g. after it was lost)."""
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with self.cond:
+            self.open -= 1
+            self.cond.notify()
+
+    def record_reconnect(self):
+        self._count("reconnects")
+
+    def metrics(self):
+        with self.cond:
+            data = dict(self.stats, size=self.size, open=self.open, idle=len(self.idle),
+                        in_use=self.open - len(self.idle))
+        data["wait_seconds"] = round(data["wait_seconds"], 3)
+        return data
+
+    def _count(self, name, amount=1):
+        with self.cond:
+            self.stats[name] += amount
+
+    def _connect(self, local_infile):
+        try:
+            conn = get_connection(local_infile)
+        except Exception:
+            with self.cond:
+                self.open -= 1
+                self.cond.notify()
+            raise
+        self._count("created")
+        return conn
+
+    @staticmethod
+    def _alive(conn):
+        try:
+            return conn.is_connected()
+        except Exception:
+            return False
+
+    def _take_idle(self, local_infile):
+        # called with self.cond held
+        now = time.monotonic()
+        for entry in [e for e in self.idle if now - e[2] > self.recycle]:
+            self.idle.remove(entry)
+            self._close_idle(entry[0])
+            self.stats["recycled"] += 1
+        for i in range(len(self.idle) - 1, -1, -1):
+            if self.idle[i][1] == local_infile:
+                return self.idle.pop(i)[0]
+        return None
+
+    def _drop_idle(self):
+        # called with self.cond held; only connections of the other kind are left idle
+        if not self.idle:
+            return False
+        self._close_idle(self.idle.pop(0)[0])
+        return True
+
+    def _close_idle(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+        self.open -= 1
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """The process-wide ConnectionPool, created on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConnectionPool()
+        return _pool
+
+
+class CountingCursor:
+    """Cursor wrapper that counts statements (round trips) and the bytes of
+    SQL sent in stats; everything else is passed through."""
+
+    def __init__(self, cursor, stats):
+        self.cursor = cursor
+        self.stats = stats
+
+    def execute(self, query, params=None):
+        self.stats["round_trips"] += 1
+        try:
+            return self.cursor.execute(query, params)
+        finally:
+            self.stats["bytes_sent"] += self._sent_bytes(query, params)
+
+    def _sent_bytes(self, query, params):
+        try:
+            statement = self.cursor.statement
+        except Exception:
+            statement = None
+        if isinstance(statement, (str, bytes)):
+            return len(statement.encode("utf-8") if isinstance(statement, str) else statement)
+        # driver did not expose the interpolated statement
+        return len(query.encode("utf-8")) + (estimate_row_bytes(params) if params else 0)
+
+    def __getattr__(self, name):
+        return getattr(self.cursor, name)
+
+
+class DbSession:
+    """Connection and cursor borrowed from the pool for one import (or one sheet
+    of it); replaced in place on reconnect and returned to the pool on close.
+    stats counts the statements and commits sent (round_trips), bytes_sent and
+    the rows written again after a lost connection (rows_replayed)."""
+
+    def __init__(self, local_infile=False, pool=None):
+        self.local_infile = local_infile
+        self.pool = pool or get_pool()
+        self.stats = {"round_trips": 0, "bytes_sent": 0, "rows_replayed": 0}
+        self.conn = self.pool.acquire(local_infile)
+        self.cursor = CountingCursor(self.conn.cursor(), self.stats)
+
+    def commit(self):
+        self.stats["round_trips"] += 1
+        self.conn.commit()
+
+    def reconnect(self):
+        if self.conn is not None:
+            self._close_cursor()
+            self.pool.discard(self.conn)
+            self.conn = None
+        # counted even if the connect fails, so failed attempts show up too
+        self.pool.record_reconnect()
+        self.conn = self.pool.acquire(self.local_infile)
+        self.cursor = CountingCursor(self.conn.cursor(), self.stats)
+
+    def close(self):
+        if self.conn is None:
+            return
+        self._close_cursor()
+        self.pool.release(self.conn, self.local_infile)
+        self.conn = None
+
+    def _close_cursor(self):
+        try:
+            self.cursor.close()
+        except Exception:
+            pass
+
+
 # ==========================
 # HELPERS
 # ==========================
+NULL_STRINGS = ("nan", "null", "none", "")
+
+
 def clean(v):
     if v is None:
         return None
@@ -60,31 +357,287 @@ def clean(v):
             return None
     except:
         pass
-    if isinstance(v, str) and v.strip().lower() in ("nan", "null", "none", ""):
+    if isinstance(v, str) and v.strip().lower() in NULL_STRINGS:
         return None
     if isinstance(v, float) and v.is_integer():
         return int(v)
     return v
 
 
-def is_json(val):
+def clean_column(series):
+    """clean() applied to every value of series, column-wise.
+
+    Returns an object array of Python scalars.  Null values and null strings
+    become None and integral floats int; float, string and homogeneous columns
+    are handled with vectorized operations, mixed object columns fall back to
+    clean() per cell."""
+    values = series.to_numpy(dtype=object, copy=True)
+    null = pd.isna(values)
+    if series.dtype.kind == "f":
+        kind = "floating"
+    elif series.dtype.kind in "iubmM":
+        # nothing to convert besides missing values (NaT, pd.NA)
+        kind = None
+    else:
+        kind = pd.api.types.infer_dtype(values, skipna=True)
+    if kind == "string":
+        text = pd.Series(values[~null], dtype=object).str.strip().str.lower()
+        null[~null] = text.isin(NULL_STRINGS).to_numpy()
+    elif kind == "floating":
+        present = np.flatnonzero(~null)
+        nums = values[present].astype("float64")
+        # int64 holds every integral float below 2**63; larger ones go through int()
+        integral = (nums == np.trunc(nums)) & (np.abs(nums) < 2.0 ** 63)
+        values[present[integral]] = nums[integral].astype("int64").astype(object)
+        big = present[~integral & np.isfinite(nums) & (nums == np.trunc(nums))]
+        values[big] = [int(v) for v in values[big]]
+    elif kind in ("mixed", "mixed-integer", "mixed-integer-float", "unknown-array"):
+        return np.array([clean(v) for v in values], dtype=object)
+    values[null] = None
+    return values
+
+
+STATUS_VALUES = {
+    "1": "published", "published": "published", "active": "published", "yes": "published",
+    "0": "draft", "draft": "draft", "inactive": "draft", "no": "draft",
+}
+
+
+def normalize_status(series):
+    """Lesson/assessment status as "published" or "draft"; missing, null
+    strings and unknown values become "draft"."""
+    text = series.astype(object).astype(str).str.strip().str.lower()
+    return text.map(STATUS_VALUES).fillna("draft").astype(object)
+
+
+# parse_json's result for values that are not JSON text
+NOT_JSON = object()
+
+
+def parse_json(val):
+    """The value a JSON string holds, or NOT_JSON for anything else.  Callers
+    parse each cell once with it instead of testing and then loading."""
     if not isinstance(val, str):
-        return False
+        return NOT_JSON
     try:
-        json.loads(val)
-        return True
-    except:
-        return False
+        return json.loads(val)
+    except (ValueError, RecursionError):
+        return NOT_JSON
+
+
+def is_json(val):
+    return parse_json(val) is not NOT_JSON
+
+
+def dump_json(obj):
+    """JSON text of a converted cell, as it is stored (non-ASCII kept as is)."""
+    return json.dumps(obj, ensure_ascii=False)
 
 
 def get_table_columns(cursor, table):
+    """{column: type} of table, in table order."""
     cursor.execute(f"SHOW COLUMNS FROM `{table}`")
-    return {row[0] for row in cursor.fetchall()}
+    # Field, Type, Null, Key, Default, Extra
+    return OrderedDict((row[0], row[1]) for row in cursor.fetchall())
+
+
+def get_unique_keys(cursor, table):
+    """Unique indexes of table as [(name, [columns])], PRIMARY first."""
+    cursor.execute(f"SHOW INDEX FROM `{table}` WHERE Non_unique = 0")
+    keys = OrderedDict()
+    # Table, Non_unique, Key_name, Seq_in_index, Column_name, ...
+    for row in sorted(cursor.fetchall(), key=lambda r: (r[2] != "PRIMARY", int(r[3]))):
+        keys.setdefault(row[2], []).append(row[4])
+    return list(keys.items())
+
+
+def get_existing_ids(cursor, table, column, ids):
+    """Return the subset of ids present in table.column, looked up in batches."""
+    ids = list(ids)
+    found = set()
+    for i in range(0, len(ids), FK_LOOKUP_BATCH):
+        batch = ids[i:i + FK_LOOKUP_BATCH]
+        cursor.execute(
+            f"SELECT DISTINCT `{column}` FROM `{table}` WHERE `{column}` IN ({','.join(['%s'] * len(batch))})",
+            batch
+        )
+        for row in cursor.fetchall():
+            try:
+                found.add(int(float(row[0])))
+            except (ValueError, TypeError):
+                pass
+    return found
+
+
+class FkResolver:
+    """Resolves candidate FK ids against the database for one import run.
+
+    Ids of rows the run has written are add()ed as they are committed, so a
+    sheet that refers to rows of an earlier sheet of the same file needs no
+    query.  Only ids neither written nor seen before are sent to the server,
+    so every referenced id is looked up at most once per run; a chunked
+    sheet sends those of each chunk as it comes, since later chunks are not
+    read yet.  Negative results are cached too: sheets are imported after the
+    tables they reference (see SHEET_DEPENDENCIES), so an id missing when a
+    sheet is checked cannot appear later in the same run.  Safe to share
+    between sheets imported in parallel; lookups run on the caller's db.
+
+    With known ({(table, column): ids}, e.g. from a schema snapshot) the resolver
+    is offline: ids are valid if they are known or were add()ed by a sheet of
+    the run, and the database is never queried."""
+
+    def __init__(self, db=None, known=None):
+        self.db = db
+        self.offline = known is not None
+        self.present = {key: set(ids) for key, ids in (known or {}).items()}
+        self.absent = {}
+        self.lock = threading.Lock()
+
+    def add(self, table, column, ids):
+        """Count ids as present in table.column (rows the run wrote, or a dry run would have)."""
+        with self.lock:
+            self.present.setdefault((table, column), set()).update(int(i) for i in ids)
+
+    def resolve(self, table, column, candidates, db=None):
+        key = (table, column)
+        with self.lock:
+            present = self.present.setdefault(key, set())
+            absent = self.absent.setdefault(key, set())
+            todo = [c for c in {int(c) for c in candidates} if c not in present and c not in absent]
+        if todo and self.offline:
+            with self.lock:
+                absent.update(todo)
+        elif todo:
+            found = get_existing_ids((db or self.db).cursor, table, column, todo)
+            with self.lock:
+                present |= found
+                absent.update(c for c in todo if c not in found)
+            logger.info(f"{table}.{column}: looked up {len(todo)} new ids, {len(found)} exist")
+        with self.lock:
+            return set(present)
 
 
-def get_id_set(cursor, table, column):
-    cursor.execute(f"SELECT `{column}` FROM `{table}`")
-    return {row[0] for row in cursor.fetchall()}
+# ==========================
+# SCHEMA CACHE AND SNAPSHOTS
+# ==========================
+class SchemaCache:
+    """Columns ({name: type}) and unique keys of each table, read from the
+    server the first time a table is used and kept until invalidate() (call it
+    after a migration).  A cache loaded from a snapshot (load_schema_snapshot)
+    is offline: it never queries the database and raises KeyError for tables
+    the snapshot does not have; its ids are the referenced ids it recorded.
+    Safe to share between threads."""
+
+    def __init__(self, tables=None, ids=None, offline=False):
+        self.tables = dict(tables or {})
+        self.ids = ids or {}
+        self.offline = offline
+        self.lock = threading.Lock()
+
+    def table(self, db, table):
+        """{"columns": {name: type}, "keys": [(name, [columns])]} of table,
+        read on db (a DbSession) if it is not cached yet."""
+        with self.lock:
+            entry = self.tables.get(table)
+        if entry is None:
+            if self.offline:
+                raise KeyError(f"Table {table} is not in the schema snapshot")
+            entry = {"columns": get_table_columns(db.cursor, table), "keys": get_unique_keys(db.cursor, table)}
+            with self.lock:
+                self.tables[table] = entry
+        return entry
+
+    def columns(self, db, table):
+        return self.table(db, table)["columns"]
+
+    def unique_keys(self, db, table):
+        return self.table(db, table)["keys"]
+
+    def invalidate(self, table=None):
+        """Forget one table (default: all), so it is read again on next use."""
+        with self.lock:
+            if table is None:
+                self.tables.clear()
+            else:
+                self.tables.pop(table, None)
+
+
+_schema = SchemaCache()
+
+
+def get_schema():
+    """The process-wide SchemaCache of the configured database."""
+    return _schema
+
+
+def snapshot_tables():
+    """Tables an import touches: every sheet and every table FK_RULES refer to."""
+    return list(OrderedDict.fromkeys(list(sheet_order) + [rule[2] for rule in FK_RULES]))
+
+
+def save_schema_snapshot(path=None, include_ids=True):
+    """Write the schema of snapshot_tables() (freshly read) to a JSON file and
+    return the snapshot.  With include_ids the ids of every column FK_RULES
+    refer to are saved too, so dry runs can check references offline.  Tables
+    missing on the server are left out."""
+    path = path or SCHEMA_SNAPSHOT_PATH
+    schema = get_schema()
+    db = DbSession()
+    try:
+        tables = OrderedDict()
+        for table in snapshot_tables():
+            schema.invalidate(table)
+            try:
+                tables[table] = schema.table(db, table)
+            except mysql.connector.Error as err:
+                logger.warning(f"Schema snapshot: skipping {table} ({err})")
+        ids = OrderedDict()
+        if include_ids:
+            for _, _, ref_table, ref_column, _ in FK_RULES:
+                key = f"{ref_table}.{ref_column}"
+                if ref_table not in tables or key in ids:
+                    continue
+                db.cursor.execute(f"SELECT DISTINCT `{ref_column}` FROM `{ref_table}`")
+                ids[key] = sorted({int(float(row[0])) for row in db.cursor.fetchall() if row[0] is not None})
+        max_packet = get_max_allowed_packet(db.cursor)
+    finally:
+        db.close()
+    snapshot = {
+        "scope": f"{DB_HOST}:{PORT}/{DB_NAME}",
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "max_allowed_packet": max_packet,
+        "tables": {t: {"columns": list(entry["columns"].items()), "keys": entry["keys"]} for t, entry in tables.items()},
+        "ids": ids,
+    }
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(snapshot, f)
+    os.replace(tmp, path)
+    logger.info(f"Schema snapshot of {len(tables)} tables written to {path}")
+    return snapshot
+
+
+def load_schema_snapshot(path=None):
+    """Offline SchemaCache from a file written by save_schema_snapshot."""
+    path = path or SCHEMA_SNAPSHOT_PATH
+    with open(path, encoding="utf-8") as f:
+        snapshot = json.load(f)
+    tables = {
+        table: {"columns": OrderedDict((name, kind) for name, kind in entry["columns"]),
+                "keys": [(name, list(cols)) for name, cols in entry["keys"]]}
+        for table, entry in snapshot["tables"].items()
+    }
+    ids = {tuple(key.split(".", 1)): set(values) for key, values in snapshot.get("ids", {}).items()}
+    logger.info(f"Schema snapshot {path} of {snapshot.get('scope')} taken {snapshot.get('created')}")
+    return SchemaCache(tables, ids, offline=True)
+
+
+def get_max_allowed_packet(cursor):
+    try:
+        cursor.execute("SELECT @@max_allowed_packet")
+        return int(cursor.fetchone()[0])
+    except Exception:
+        return DEFAULT_MAX_ALLOWED_PACKET
 
 
 # ==========================
@@ -118,10 +671,7 @@ def _children_with_links(tag):
     return children
 
 
-def html_to_block_json(html):
-    if not html:
-        return None
-
+def bs4_blocks(html):
     soup = BeautifulSoup(html, "html.parser")
     blocks = []
 
@@ -143,7 +693,20 @@ def html_to_block_json(html):
                 "ordered": tag.name == "ol",
                 "items": [{"text": li.get_text(strip=True)} for li in tag.find_all("li")]
             })
+    return blocks
+
+
+HTML_ENGINES = {
+    "bs4": bs4_blocks,
+    "stdlib": html_engines.stdlib_blocks,
+    "lxml": html_engines.lxml_blocks,
+}
 
+
+def html_to_block_json(html, engine=None):
+    if not html:
+        return None
+    blocks = HTML_ENGINES[engine or HTML_ENGINE](html)
     return {"content": blocks} if blocks else None
 
 
@@ -157,16 +720,18 @@ def plain_text_to_block_json(text):
     }
 
 
+def html_content_json(content):
+    block = html_to_block_json(strip_gutenberg(content))
+    return block if block else plain_text_to_block_json(content)
+
+
 def content_to_json(content):
     if not content:
         return {"content": []}
-    if is_json(content):
-        try:
-            return json.loads(content)
-        except:
-            return plain_text_to_block_json(content)
-    block = html_to_block_json(strip_gutenberg(content))
-    return block if block else plain_text_to_block_json(content)
+    parsed = parse_json(content)
+    if parsed is not NOT_JSON:
+        return parsed
+    return html_content_json(content)
 
 
 # ==========================
@@ -190,20 +755,95 @@ def safe_int(v):
         return 0
 
 
+# answer_data as LearnDash stores it: a PHP array of WpProQuiz_Model_AnswerTypes
+# objects.  _WPPRO_OBJECT splits it into objects; _WPPRO_FIELD finds the members
+# convert_answer_data needs as (name, declared length, text, raw): strings fill
+# length and text (which runs to the first '";'), N;, b:, i: and d: values raw.
+_PHP_ARRAY_HEAD = re.compile(rb'a:(\d+):\{')
+_WPPRO_OBJECT = re.compile(rb'O:\d+:"[^"]*":\d+:\{')
+_WPPRO_FIELD = re.compile(
+    rb'"\*_(answer|correct|points)";(?:s:(\d+):"([^"]*(?:"(?!;)[^"]*)*)";|(N;|[bid]:[^;"]*;))'
+)
+
+
+def _php_number(raw):
+    """int/float of a raw N;, b:, i: or d: value; N; is 0."""
+    if raw == b"N;":
+        return 0
+    if raw[:1] == b"d":
+        return float(raw[2:-1])
+    return int(raw[2:-1])
+
+
+def decode_answer_options(s):
+    """(text, correct, points) of each answer object of a PHP-serialized
+    answer_data list, found in one scan of its UTF-8 bytes: *_answer stripped
+    (answers without text are left out), *_correct as a bool and *_points as an
+    int.  Answer lengths are checked in bytes, so multibyte text comes out
+    whole.  None if the text is not such a list or anything is off (a length
+    that does not match, a repeated member, more or fewer objects than the
+    array holds, other value types); convert_answer_data then falls back to
+    phpserialize and the regex fallback."""
+    try:
+        data = s.encode("utf-8")
+    except UnicodeEncodeError:
+        return None
+    head = _PHP_ARRAY_HEAD.match(data)
+    if head is None:
+        return None
+    count = int(head.group(1))
+    objects = _WPPRO_OBJECT.split(data, count + 1)[1:]
+    if len(objects) != count:
+        return None
+    options = []
+    try:
+        for obj in objects:
+            fields = {}
+            for name, length, text, raw in _WPPRO_FIELD.findall(obj):
+                if name in fields:
+                    return None
+                if raw:
+                    fields[name] = raw
+                elif name == b"answer" and len(text) == int(length):
+                    fields[name] = text.decode("utf-8")
+                else:
+                    return None
+            if len(fields) < 3 and any(b'"*_%s";' % name in obj for name in (b"answer", b"correct", b"points")
+                                       if name not in fields):
+                # a member that is there but unreadable
+                return None
+            text = fields.get(b"answer")
+            if not isinstance(text, str) or not text.strip():
+                continue
+            points = fields.get(b"points", b"N;")
+            if points[:1] == b"b":
+                return None
+            options.append((text.strip(), _php_number(fields.get(b"correct", b"N;")) != 0,
+                            int(_php_number(points))))
+    except (ValueError, OverflowError):
+        return None
+    return options
+
+
+_FALLBACK_ANSWER = re.compile(r'"\*_answer";s:(\d+):"')
+_FALLBACK_CORRECT = re.compile(r'"\*_correct";[bi]:(\d+)')
+_FALLBACK_POINTS = re.compile(r'"\*_points";(?:i:(\d+)|d:([\d.]+)|N);')
+
+
 def _regex_fallback_answer_data(s):
     """When phpserialize fails, extract *_answer, *_correct, *_points from raw PHP serialized string."""
     s = str(s)
     answer_texts = []
-    for m in re.finditer(r'"\*_answer";s:(\d+):"', s):
+    for m in _FALLBACK_ANSWER.finditer(s):
         start = m.end()
         length = int(m.group(1))
         if start + length <= len(s):
             text = s[start:start + length]
             if text.strip():
                 answer_texts.append(text.strip())
-    correct_list = [bool(int(c)) for c in re.findall(r'"\*_correct";[bi]:(\d+)', s)]
+    correct_list = [bool(int(c)) for c in _FALLBACK_CORRECT.findall(s)]
     points_list = []
-    for m in re.finditer(r'"\*_points";(?:i:(\d+)|d:([\d.]+)|N);', s):
+    for m in _FALLBACK_POINTS.finditer(s):
         if m.group(1) is not None:
             points_list.append(int(m.group(1)))
         elif m.group(2) is not None:
@@ -243,14 +883,25 @@ def convert_answer_data(val):
         return base
 
     s = str(val).strip()
-    if is_json(s):
-        try:
-            obj = json.loads(s)
-            if isinstance(obj, dict) and "options" in obj and isinstance(obj["options"], list):
-                return obj
-        except Exception:
-            pass
+    # only a JSON object can hold options; PHP blobs are not handed to the JSON parser
+    obj = parse_json(s) if s.startswith("{") else NOT_JSON
+    if isinstance(obj, dict) and "options" in obj and isinstance(obj["options"], list):
+        return obj
+
+    options = decode_answer_options(s)
+    if options:
+        for option_id, (text, is_correct, points) in enumerate(options, 1):
+            if is_correct and points == 0:
+                points = 1
+            base["options"].append({"id": option_id, "text": text, "correct": is_correct, "points": points})
+            base["totalPoints"] += points
+        return base
+    return _phpserialize_answer_data(s, base)
+
 
+def _phpserialize_answer_data(s, base):
+    """convert_answer_data for blobs decode_answer_options does not take:
+    phpserialize, else the regex fallback."""
     try:
         cleaned = s.replace("N;", "s:0:\"\";")
         parsed = phpserialize.loads(
@@ -297,311 +948,1443 @@ def convert_answer_data(val):
         return base
 
 
+# ==========================
+# COLUMN CONVERSION (optionally in a process pool)
+# ==========================
+def content_cell_json(x):
+    """content_to_json of a cell as stored text.  A cell that already holds
+    JSON (e.g. block JSON exported by an earlier import) is parsed once and
+    written back in the canonical dump_json form."""
+    if not x:
+        return dump_json({"content": []})
+    parsed = parse_json(x)
+    if parsed is NOT_JSON:
+        return dump_json(html_content_json(x))
+    return dump_json(parsed)
+
+
+def answer_cell_json(x):
+    return dump_json(convert_answer_data(x))
+
+
+def count_failed_conversions(source, converted, func):
+    """Cells of source with text that func converted to an empty document (no
+    blocks, or no answer options)."""
+    has_text = source.notna() & source.astype(str).str.strip().ne("")
+    return int((has_text & converted.eq(func(None))).sum())
+
+
+def conversion_workers(setting=None):
+    setting = CONVERT_WORKERS if setting is None else setting
+    if str(setting).strip().lower() == "auto":
+        try:
+            cores = len(os.sched_getaffinity(0))
+        except AttributeError:
+            cores = os.cpu_count() or 1
+        # a single worker process is only overhead
+        return cores if cores > 1 else 0
+    return int(setting)
+
+
+def make_convert_pool(workers=None):
+    """Process pool for convert_columns, or None when conversion runs in-process."""
+    workers = conversion_workers(workers)
+    return ProcessPoolExecutor(max_workers=workers) if workers > 0 else None
+
+
+class ConversionCache:
+    """Memoizes converted cells by a hash of (converter, raw value).
+
+    An in-memory LRU of at most max_size entries serves repeats within one
+    import (default: CONVERT_CACHE_SIZE); with a path (default:
+    CONVERT_CACHE_PATH, "" for none), entries are also kept in a SQLite file so
+    unchanged cells of a re-uploaded workbook are not parsed again.  Since the last
+    reset_stats(), hits counts cells served without converting, misses the
+    distinct values converted and disk_hits the distinct values read from disk."""
+
+    def __init__(self, max_size=None, path=None):
+        # read at call time, so changing the module settings takes effect
+        self.max_size = CONVERT_CACHE_SIZE if max_size is None else max_size
+        if path is None:
+            path = CONVERT_CACHE_PATH
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+        self.db = None
+        if path:
+            self.db = sqlite3.connect(path, check_same_thread=False)
+            self.db.execute("CREATE TABLE IF NOT EXISTS conversions (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            self.db.commit()
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def view(self):
+        """Handle on the same entries with its own hit/miss counters, so sheets
+        imported in parallel each report their own statistics."""
+        view = copy.copy(self)
+        view.reset_stats()
+        return view
+
+    @staticmethod
+    def key(func, value):
+        # The engine is part of the key: lxml can repair malformed markup differently
+        raw = f"{CONVERT_CACHE_VERSION}:{HTML_ENGINE}:{func.__name__}:{type(value).__name__}:{value}"
+        return hashlib.blake2b(raw.encode("utf-8", "surrogatepass"), digest_size=16).hexdigest()
+
+    def get_many(self, keys):
+        found = {}
+        with self.lock:
+            for k in keys:
+                if k in self.memory:
+                    self.memory.move_to_end(k)
+                    found[k] = self.memory[k]
+            missing = [k for k in keys if k not in found]
+            if self.db is not None and missing:
+                for i in range(0, len(missing), 500):
+                    batch = missing[i:i + 500]
+                    rows = self.db.execute(
+                        f"SELECT key, value FROM conversions WHERE key IN ({','.join('?' * len(batch))})", batch
+                    ).fetchall()
+                    for k, v in rows:
+                        found[k] = v
+                        self._remember(k, v)
+                    self.disk_hits += len(rows)
+        return found
+
+    def put_many(self, items):
+        items = list(items)
+        with self.lock:
+            for k, v in items:
+                self._remember(k, v)
+            if self.db is not None and items:
+                self.db.executemany("INSERT OR REPLACE INTO conversions (key, value) VALUES (?, ?)", items)
+                self.db.commit()
+
+    def _remember(self, k, v):
+        self.memory[k] = v
+        self.memory.move_to_end(k)
+        while len(self.memory) > self.max_size:
+            self.memory.popitem(last=False)
+
+    def close(self):
+        if self.db is not None:
+            self.db.close()
+            self.db = None
+
+
+def _convert_values(func, values):
+    return [func(v) for v in values]
+
+
+def _submit_conversion(func, values, pool):
+    """Futures (or plain results when converted in-process) for values, in order."""
+    if pool is None or len(values) <= CONVERT_CHUNK:
+        return [_convert_values(func, values)]
+    return [pool.submit(_convert_values, func, values[i:i + CONVERT_CHUNK])
+            for i in range(0, len(values), CONVERT_CHUNK)]
+
+
+def _collect_conversion(parts):
+    out = []
+    for part in parts:
+        out.extend(part if isinstance(part, list) else part.result())
+    return out
+
+
+def convert_columns(df, jobs, pool=None, cache=None):
+    """Apply func to every cell of each (column, func) job.
+
+    With a cache, only distinct values not already cached are converted.  With a
+    pool, the conversions of all columns are split into CONVERT_CHUNK-sized tasks
+    submitted together and reassembled in order; the output is identical to
+    converting every cell serially."""
+    pending = []
+    for col, func in jobs:
+        values = df[col].tolist()
+        if cache is None:
+            pending.append((col, func, values, None, None, _submit_conversion(func, values, pool)))
+            continue
+        keys = [cache.key(func, v) for v in values]
+        found = cache.get_many(list(dict.fromkeys(keys)))
+        todo = {}
+        for k, v in zip(keys, values):
+            if k not in found and k not in todo:
+                todo[k] = v
+        cache.misses += len(todo)
+        cache.hits += len(keys) - len(todo)
+        pending.append((col, func, keys, found, list(todo), _submit_conversion(func, list(todo.values()), pool)))
+    for col, func, keys, found, todo_keys, parts in pending:
+        converted = _collect_conversion(parts)
+        if cache is None:
+            out = converted
+        else:
+            fresh = dict(zip(todo_keys, converted))
+            cache.put_many(fresh.items())
+            found.update(fresh)
+            out = [found[k] for k in keys]
+        df[col] = pd.Series(out, index=df.index, dtype=object)
+    return df
+
+
 # ==========================
 # UPSERT
 # ==========================
-def build_upsert_query(table, columns):
+def build_upsert_updates(columns):
+    return ",".join(f"`{c}`=VALUES(`{c}`)" for c in columns if c.lower() != "id")
+
+
+def build_upsert_query(table, columns, rows=1):
     quoted = [f"`{c}`" for c in columns]
-    updates = [f"`{c}`=VALUES(`{c}`)" for c in columns if c.lower() != "id"]
+    placeholders = "(" + ",".join(["%s"] * len(columns)) + ")"
     return f"""
         INSERT INTO `{table}` ({",".join(quoted)})
-        VALUES ({",".join(["%s"] * len(columns))})
-        ON DUPLICATE KEY UPDATE {",".join(updates)}
+        VALUES {",".join([placeholders] * rows)}
+        ON DUPLICATE KEY UPDATE {build_upsert_updates(columns)}
     """
 
 
+def estimate_row_bytes(row):
+    """Rough wire size of one row inside a multi-row INSERT."""
+    size = 2
+    for v in row:
+        if v is None:
+            size += 5
+        elif isinstance(v, str):
+            size += len(v.encode("utf-8")) + 3
+        else:
+            size += len(str(v)) + 3
+    return size
+
+
+def iter_batches(rows, max_rows, max_bytes):
+    """Group rows into batches of at most max_rows rows and ~max_bytes bytes.
+    A single row larger than max_bytes is still sent on its own."""
+    batch = []
+    batch_bytes = 0
+    for row in rows:
+        row_bytes = estimate_row_bytes(row)
+        if batch and (len(batch) >= max_rows or batch_bytes + row_bytes > max_bytes):
+            yield batch
+            batch = []
+            batch_bytes = 0
+        batch.append(row)
+        batch_bytes += row_bytes
+    if batch:
+        yield batch
+
+
+def _execute_batch(db, sheet, columns, batch, offset, single_query):
+    """Execute one batch without committing and return the rows written.  A
+    batch the server rejects is retried row by row so the failing rows are
+    logged individually and the rest is still written.  Raises
+    mysql.connector.Error only for CONNECTION_LOST_ERRORS."""
+    if len(batch) > 1:
+        try:
+            db.cursor.execute(build_upsert_query(sheet, columns, len(batch)), [v for row in batch for v in row])
+            return batch
+        except mysql.connector.Error as err:
+            if err.errno in CONNECTION_LOST_ERRORS:
+                raise
+            logger.warning(f"{sheet} batch at row {offset} failed ({err}); retrying row by row")
+    written = []
+    for i, row_data in enumerate(batch):
+        try:
+            db.cursor.execute(single_query, row_data)
+        except mysql.connector.Error as err:
+            if err.errno in CONNECTION_LOST_ERRORS:
+                raise
+            logger.error(f"{sheet} row {offset + i} failed: {err}")
+        else:
+            written.append(row_data)
+    return written
+
+
+def reconnect_with_backoff(db, sheet, label, attempt):
+    """Replace db's lost connection, waiting RECONNECT_BACKOFF * 2**attempt
+    seconds (at most RECONNECT_BACKOFF_MAX) first."""
+    delay = min(RECONNECT_BACKOFF * 2 ** attempt, RECONNECT_BACKOFF_MAX)
+    logger.warning(f"{sheet} {label}: connection lost, reconnecting in {delay:g}s "
+                   f"(attempt {attempt + 1} of {MAX_RECONNECT_RETRIES})...")
+    time.sleep(delay)
+    db.reconnect()
+
+
+def write_batch(db, sheet, columns, batch, offset, single_query):
+    """Execute and commit one batch; returns the rows written, or None if the
+    server refused the commit.
+
+    The batch is kept until it is committed: when the connection is lost before
+    that, its open transaction is lost too, so the whole batch is replayed on a
+    new connection (reconnect_with_backoff) up to MAX_RECONNECT_RETRIES times,
+    after which the error is raised rather than leaving the rows unwritten."""
+    label = f"rows {offset}-{offset + len(batch) - 1}" if len(batch) > 1 else f"row {offset}"
+    attempt = 0
+    while True:
+        try:
+            written = _execute_batch(db, sheet, columns, batch, offset, single_query)
+            db.commit()
+            return written
+        except mysql.connector.Error as err:
+            if err.errno not in CONNECTION_LOST_ERRORS:
+                # only the commit raises anything else
+                logger.error(f"{sheet} batch commit failed: {err}")
+                return None
+            if attempt >= MAX_RECONNECT_RETRIES:
+                logger.error(f"{sheet} {label}: connection lost {attempt + 1} times; giving up on the batch")
+                raise
+        while True:
+            try:
+                reconnect_with_backoff(db, sheet, label, attempt)
+                break
+            except mysql.connector.Error as err:
+                attempt += 1
+                if attempt >= MAX_RECONNECT_RETRIES:
+                    raise
+                logger.warning(f"{sheet} {label}: reconnect failed ({err})")
+        attempt += 1
+        db.stats["rows_replayed"] += len(batch)
+        logger.warning(f"{sheet} {label}: replaying {len(batch)} uncommitted rows on the new connection")
+
+
+def write_rows(db, sheet, columns, rows, max_packet, on_commit=None):
+    """Upsert rows with one multi-row statement per batch, committing after each
+    batch (write_batch, which replays a batch lost with its connection).
+    ``on_commit(written, done)`` is called after each committed batch with the
+    rows it wrote and the number of leading rows that are now committed or
+    failed for good (None once a commit has failed: later rows may be committed
+    but the refused batch is not)."""
+    single_query = build_upsert_query(sheet, columns)
+    max_bytes = int(max_packet * PACKET_FILL_RATIO)
+    offset = 0
+    done = 0
+    replayed = db.stats["rows_replayed"]
+    for batch in iter_batches(rows, BATCH_SIZE, max_bytes):
+        written = write_batch(db, sheet, columns, batch, offset, single_query)
+        offset += len(batch)
+        if written is None:
+            done = None
+            continue
+        logger.info(f"{sheet}: committed batch up to row {offset}")
+        if done is not None:
+            done = offset
+        if on_commit is not None:
+            on_commit(written, done)
+    replayed = db.stats["rows_replayed"] - replayed
+    if replayed:
+        logger.warning(f"{sheet}: replayed {replayed} uncommitted rows after lost connections")
+    return offset
+
+
 # ==========================
-# SHEET ORDER
+# BULK LOAD (LOAD DATA LOCAL INFILE)
 # ==========================
-sheet_order = [
-    'editors',
-    'categories',
-    'subcategories',
-    'topic_categories',
-    'courses',
-    'modules',
-    'lessons',
-    'assessments',
-    'module_contents',
-    'questions',
-    'question_links'
-]
+def tsv_field(v):
+    """Encode one cleaned value for LOAD DATA's default FIELDS/LINES format."""
+    if v is None:
+        return "\\N"
+    if isinstance(v, bool):
+        return "1" if v else "0"
+    if isinstance(v, datetime.datetime):
+        return v.isoformat(sep=" ")
+    if isinstance(v, (datetime.date, datetime.time)):
+        return v.isoformat()
+    return (str(v).replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n")
+            .replace("\r", "\\r").replace("\0", "\\0"))
+
+
+def write_tsv(rows, path):
+    with open(path, "w", encoding="utf-8", newline="\n") as f:
+        for row in rows:
+            f.write("\t".join(tsv_field(v) for v in row))
+            f.write("\n")
+
+
+def bulk_load_rows(db, sheet, columns, rows):
+    """Load rows through a staging table and merge them with one set-based upsert.
+
+    Staging columns are untyped LONGTEXT so all type conversion happens in the
+    INSERT ... SELECT, exactly as it would for the VALUES of build_upsert_query;
+    rows are merged in file order so duplicate keys resolve the same way too.
+    Returns False (after rolling back) if the server rejects the load, so the
+    caller can fall back to write_rows."""
+    stage = f"_stage_{sheet}"
+    quoted = ",".join(f"`{c}`" for c in columns)
+    os.makedirs(BULK_STAGING_DIR, exist_ok=True)
+    fd, path = tempfile.mkstemp(prefix=f"{sheet}_", suffix=".tsv", dir=BULK_STAGING_DIR)
+    os.close(fd)
+    try:
+        write_tsv(rows, path)
+        db.cursor.execute(f"DROP TEMPORARY TABLE IF EXISTS `{stage}`")
+        db.cursor.execute(
+            f"CREATE TEMPORARY TABLE `{stage}` (`_stage_row` BIGINT AUTO_INCREMENT PRIMARY KEY, "
+            + ",".join(f"`{c}` LONGTEXT NULL" for c in columns)
+            + ") DEFAULT CHARSET=utf8mb4"
+        )
+        db.cursor.execute(
+            f"LOAD DATA LOCAL INFILE %s INTO TABLE `{stage}` CHARACTER SET utf8mb4 "
+            f"FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\' LINES TERMINATED BY '\\n' ({quoted})",
+            (path,)
+        )
+        loaded = db.cursor.rowcount
+        db.stats["bytes_sent"] += os.path.getsize(path)
+        db.cursor.execute(
+            f"INSERT INTO `{sheet}` ({quoted}) SELECT {quoted} FROM `{stage}` ORDER BY `_stage_row` "
+            f"ON DUPLICATE KEY UPDATE {build_upsert_updates(columns)}"
+        )
+        db.commit()
+        logger.info(f"{sheet}: bulk loaded {loaded} rows via staging table")
+        return True
+    except mysql.connector.Error as err:
+        logger.warning(f"{sheet}: bulk load failed ({err}); falling back to batched upserts")
+        try:
+            db.conn.rollback()
+        except mysql.connector.Error:
+            pass
+        return False
+    finally:
+        try:
+            db.cursor.execute(f"DROP TEMPORARY TABLE IF EXISTS `{stage}`")
+        except mysql.connector.Error:
+            pass
+        try:
+            os.remove(path)
+        except OSError:
+            pass
 
 
-def import_excel(excel_path):
-    """Main entry point used by the Flask UI.  Takes a path to an Excel file and
-    imports its sheets into the configured MySQL/MariaDB database."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    logger.info("Connected to MariaDB")
+# ==========================
+# INCREMENTAL IMPORT (ROW FINGERPRINTS)
+# ==========================
+class RowFingerprints:
+    """Fingerprints of the rows written by previous imports, per (table, key).
+
+    Kept in a SQLite file and scoped to the target database, so an incremental
+    import only sends rows that are new or changed since they were last written.
+    Rows changed or deleted in the database by other means are not noticed;
+    delete the file to force a full import.  path defaults to FINGERPRINT_PATH."""
+
+    def __init__(self, path=None, scope=None):
+        self.scope = scope or f"{DB_HOST}:{PORT}/{DB_NAME}"
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path or FINGERPRINT_PATH, check_same_thread=False)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS fingerprints (scope TEXT NOT NULL, tbl TEXT NOT NULL, "
+            "key TEXT NOT NULL, hash TEXT NOT NULL, PRIMARY KEY (scope, tbl, key))"
+        )
+        self.db.commit()
+
+    def get_many(self, table, keys):
+        found = {}
+        with self.lock:
+            for i in range(0, len(keys), 500):
+                batch = keys[i:i + 500]
+                found.update(self.db.execute(
+                    f"SELECT key, hash FROM fingerprints WHERE scope = ? AND tbl = ? "
+                    f"AND key IN ({','.join('?' * len(batch))})", [self.scope, table] + batch
+                ).fetchall())
+        return found
+
+    def put_many(self, table, items):
+        items = [(self.scope, table, k, h) for k, h in items]
+        if not items:
+            return
+        with self.lock:
+            self.db.executemany(
+                "INSERT OR REPLACE INTO fingerprints (scope, tbl, key, hash) VALUES (?, ?, ?, ?)", items
+            )
+            self.db.commit()
+
+    def close(self):
+        if self.db is not None:
+            self.db.close()
+            self.db = None
+
+
+def fingerprint_key(unique_keys, columns):
+    """Positions in columns of the unique key upserts resolve on (of the table's
+    unique_keys, the primary key if the sheet carries it, else the first unique
+    index it does), or None if the sheet carries no complete unique key."""
+    for _, key in unique_keys:
+        if all(c in columns for c in key):
+            return [columns.index(c) for c in key]
+    return None
+
+
+def row_fingerprint(columns, key_idx, row):
+    """(key, hash) of one cleaned row; (None, None) if a key column is empty."""
+    key = [row[i] for i in key_idx]
+    if any(v is None for v in key):
+        return None, None
+    raw = "\t".join(columns) + "\n" + "\t".join(tsv_field(v) for v in row)
+    digest = hashlib.blake2b(raw.encode("utf-8", "surrogatepass"), digest_size=16).hexdigest()
+    return "\t".join(tsv_field(v) for v in key), digest
+
+
+def split_unchanged_rows(fingerprints, table, columns, key_idx, rows, counts, seen=None):
+    """Drop rows whose fingerprint matches the one recorded for their key, and
+    rows followed by another with the same key (the upsert would overwrite
+    them, so only the last one is compared and recorded).  Returns the
+    positions in rows of the rows to write; counts["inserted"/"updated"/
+    "skipped"] are increased for keys not seen before, changed rows and
+    dropped rows.
+
+    seen is the set of keys of the sheet's earlier chunks; the keys of rows
+    are added to it and counts["repeated"] is increased by those already in
+    it.  Such a key's earlier row has been written already, so its row here
+    is compared with the fingerprint recorded for that one."""
+    prints = [row_fingerprint(columns, key_idx, row) for row in rows]
+    last = {key: i for i, (key, _) in enumerate(prints) if key is not None}
+    known = fingerprints.get_many(table, list(last))
+    if seen is not None:
+        counts["repeated"] += len(seen.intersection(last))
+        seen.update(last)
+    keep = []
+    for i, (key, digest) in enumerate(prints):
+        if key is not None and last[key] != i:
+            counts["skipped"] += 1
+            continue
+        if key is None or key not in known:
+            counts["inserted"] += 1
+        elif known[key] != digest:
+            counts["updated"] += 1
+        else:
+            counts["skipped"] += 1
+            continue
+        keep.append(i)
+    return keep
 
-    xls = pd.ExcelFile(excel_path)
-    logger.info(f"Sheets found: {xls.sheet_names}")
 
-    for sheet in sheet_order:
-        if sheet not in xls.sheet_names:
-            continue
+def record_fingerprints(fingerprints, table, columns, key_idx, rows):
+    prints = (row_fingerprint(columns, key_idx, row) for row in rows)
+    fingerprints.put_many(table, [(k, h) for k, h in prints if k is not None])
 
-        logger.info(f"Processing {sheet}")
-        df = pd.read_excel(excel_path, sheet_name=sheet)
-
-        # Lessons: use Excel lesson ID as lesson_id (add UNIQUE on lesson_id in DB to avoid duplicate rows on re-run)
-        if sheet == "lessons":
-            if "lesson_id" not in df.columns:
-                renamed = False
-                for cand in ["ID", "Id", "Lesson ID", "lessonID", "lessonId", "LessonId", "LESSON_ID", "Lesson_ID"]:
-                    if cand in df.columns:
-                        df = df.rename(columns={cand: "lesson_id"})
-                        renamed = True
-                        break
-                if not renamed:
-                    for c in df.columns:
-                        if str(c).strip().lower() in ("lessonid", "lesson_id", "lesson id"):
-                            df = df.rename(columns={c: "lesson_id"})
-                            break
-            if "lesson_id" in df.columns:
-                df["lesson_id"] = df["lesson_id"].map(clean)
-
-        # module_contents: ensure Excel lessonId/Lesson ID -> lesson_id so column is not dropped
-        if sheet == "module_contents" and "lesson_id" not in df.columns:
-            for cand in ["lessonId", "LessonId", "Lesson ID", "lessonID", "LESSON_ID", "Lesson_ID"]:
-                if cand in df.columns:
-                    df = df.rename(columns={cand: "lesson_id"})
-                    break
-            else:
-                for c in list(df.columns):
-                    if str(c).strip().lower() in ("lessonid", "lesson_id", "lesson id"):
-                        df = df.rename(columns={c: "lesson_id"})
-                        break
 
-        db_cols = get_table_columns(cursor, sheet)
-        df = df[[c for c in df.columns if c in db_cols]]
+# ==========================
+# CHECKPOINTS (RESUMABLE IMPORTS)
+# ==========================
+def file_digest(path):
+    """SHA-256 hex digest of a file's content."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ImportCheckpoints:
+    """Durable progress of unfinished imports, per file content hash and sheet.
+
+    A checkpoint (offset, done) means every source row of the sheet before
+    offset (0-based, header excluded) was committed or deliberately left out,
+    and done that the whole sheet was.  Kept in a SQLite file and scoped to the
+    target database like RowFingerprints (path defaults to CHECKPOINT_PATH); an
+    import that succeeds clears its checkpoints."""
+
+    def __init__(self, path=None, scope=None):
+        self.scope = scope or f"{DB_HOST}:{PORT}/{DB_NAME}"
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path or CHECKPOINT_PATH, check_same_thread=False)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS checkpoints (scope TEXT NOT NULL, digest TEXT NOT NULL, "
+            "sheet TEXT NOT NULL, row_offset INTEGER NOT NULL, done INTEGER NOT NULL, updated REAL, "
+            "PRIMARY KEY (scope, digest, sheet))"
+        )
+        self.db.commit()
+
+    def load(self, digest):
+        """{sheet: (offset, done)} recorded for a file."""
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT sheet, row_offset, done FROM checkpoints WHERE scope = ? AND digest = ?",
+                (self.scope, digest)
+            ).fetchall()
+        return {sheet: (offset, bool(done)) for sheet, offset, done in rows}
+
+    def save(self, digest, sheet, offset, done=False):
+        with self.lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO checkpoints (scope, digest, sheet, row_offset, done, updated) "
+                "VALUES (?, ?, ?, ?, ?, ?)", (self.scope, digest, sheet, offset, int(done), time.time())
+            )
+            self.db.commit()
 
-        if df.empty:
+    def clear(self, digest):
+        with self.lock:
+            self.db.execute("DELETE FROM checkpoints WHERE scope = ? AND digest = ?", (self.scope, digest))
+            self.db.commit()
+
+    def close(self):
+        if self.db is not None:
+            self.db.close()
+            self.db = None
+
+
+def get_checkpoints(digest):
+    """Checkpoints of an unfinished import of the file with this content hash
+    ({sheet: (offset, done)}, empty if there are none or checkpoints are off)."""
+    if not CHECKPOINT_PATH:
+        return {}
+    checkpoints = ImportCheckpoints()
+    try:
+        return checkpoints.load(digest)
+    finally:
+        checkpoints.close()
+
+
+def discard_checkpoints(digest):
+    """Forget the checkpoints of a file so its next import starts from the first sheet."""
+    if not CHECKPOINT_PATH:
+        return
+    checkpoints = ImportCheckpoints()
+    try:
+        checkpoints.clear(digest)
+    finally:
+        checkpoints.close()
+
+
+# ==========================
+# INPUT FORMATS AND READERS
+# ==========================
+# per-table inputs, one file per sheet named after its table
+TABLE_EXTENSIONS = (".csv", ".parquet")
+
+
+def input_format(path):
+    """"excel" for an .xlsx or .xls workbook, "tables" for per-table CSV or
+    Parquet files (a directory, a .zip of them or one such file).  Decided by
+    content where the name may not tell (uploads are stored under their hash)."""
+    if os.path.isdir(path):
+        return "tables"
+    if str(path).lower().endswith(TABLE_EXTENSIONS):
+        return "tables"
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as zf:
+            # every OOXML package has this part; a plain archive of tables does not
+            return "excel" if "[Content_Types].xml" in zf.namelist() else "tables"
+    return "excel"
+
+
+def excel_engine(setting=None):
+    """pandas engine for whole-sheet reads (see EXCEL_ENGINE); None lets pandas
+    pick by format (openpyxl for .xlsx, xlrd for .xls)."""
+    setting = setting or EXCEL_ENGINE
+    if setting == "auto":
+        try:
+            import python_calamine  # noqa: F401
+        except ImportError:
+            return None
+        # pandas reads through calamine from 2.2 on
+        return "calamine" if tuple(int(p) for p in pd.__version__.split(".")[:2]) >= (2, 2) else None
+    return None if setting == "openpyxl" else setting
+
+
+def load_workbook_frames(excel_path, sheets, engine=None):
+    """Parse every wanted sheet exactly once, through a single ExcelFile handle
+    (engine: see excel_engine).  Returns {sheet: DataFrame} for the sheets
+    present in the workbook."""
+    with pd.ExcelFile(excel_path, engine=excel_engine(engine)) as xls:
+        logger.info(f"Sheets found: {xls.sheet_names}")
+        wanted = [s for s in sheets if s in xls.sheet_names]
+        if not wanted:
+            return {}
+        return pd.read_excel(xls, sheet_name=wanted)
+
+
+def read_table_file(f, name):
+    if name.lower().endswith(".parquet"):
+        try:
+            return pd.read_parquet(f)
+        except ImportError as e:
+            # pandas reads Parquet through an optional engine
+            raise ImportError(f"Parquet input needs pyarrow (pip install pyarrow); cannot read {name}") from e
+    # utf-8-sig: spreadsheet programs start CSV exports with a byte order mark
+    return pd.read_csv(f, encoding="utf-8-sig")
+
+
+def load_table_frames(path, sheets):
+    """Read per-table files, <sheet>.csv or <sheet>.parquet, from a .zip
+    archive, a directory or a single file.  Returns {sheet: DataFrame} for the
+    wanted sheets found, like load_workbook_frames; other files are ignored.
+    CSV goes through the same parser and NA strings as read_excel."""
+    wanted = set(sheets)
+
+    def table_of(name):
+        base, ext = os.path.splitext(os.path.basename(name))
+        return base if ext.lower() in TABLE_EXTENSIONS and base in wanted else None
+
+    frames = {}
+
+    def add(name, read):
+        sheet = table_of(name)
+        if sheet is None:
+            return
+        if sheet in frames:
+            raise ValueError(f"More than one file for table {sheet}")
+        frames[sheet] = read()
+
+    if os.path.isdir(path):
+        names = sorted(os.listdir(path))
+        logger.info(f"Files found: {names}")
+        for name in names:
+            add(name, lambda: read_table_file(os.path.join(path, name), name))
+    elif zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as zf:
+            names = [info.filename for info in zf.infolist() if not info.is_dir()]
+            logger.info(f"Files found: {names}")
+            for name in names:
+                # Parquet needs a seekable file
+                add(name, lambda: read_table_file(io.BytesIO(zf.read(name)), name))
+    else:
+        add(path, lambda: read_table_file(path, str(path)))
+    if not frames:
+        logger.warning(f"No {' or '.join(TABLE_EXTENSIONS)} files named after a table in {path}")
+    return frames
+
+
+def read_frames(path, engine=None):
+    """Whole-sheet frames of every sheet in sheet_order found in a workbook or
+    per-table input (see input_format), as import_excel reads them."""
+    if input_format(path) == "tables":
+        return load_table_frames(path, sheet_order)
+    return load_workbook_frames(path, sheet_order, engine)
+
+
+# ==========================
+# STREAMING READER (openpyxl read-only)
+# ==========================
+EXCEL_ERROR_CODES = set(openpyxl.cell.cell.ERROR_CODES)
+
+
+def excel_cell(v):
+    """read_excel's conversion of one raw openpyxl cell value (see pandas' _convert_cell)."""
+    if v is None:
+        return ""
+    if isinstance(v, str) and v in EXCEL_ERROR_CODES:
+        return float("nan")
+    if isinstance(v, float) and v.is_integer():
+        return int(v)
+    return v
+
+
+def header_names(header):
+    """Column names for a raw header row, following read_excel's naming."""
+    names = []
+    seen = {}
+    for i, h in enumerate(header):
+        name = excel_cell(h)
+        if name == "" or (isinstance(name, float) and name != name):
+            name = f"Unnamed: {i}"
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+
+def parse_chunk(columns, rows, start=0):
+    # same parser and options read_excel uses, so NA strings and numeric inference match
+    df = TextParser([columns] + rows, header=0, skip_blank_lines=False).read()
+    # index rows by their position in the sheet, as a whole-sheet read does
+    df.index = pd.RangeIndex(start, start + len(df))
+    return df
+
+
+def iter_sheet_chunks(ws, chunk_size, keep_columns):
+    """Yield DataFrames of at most chunk_size rows from a read-only worksheet.
+
+    keep_columns(names) receives the header names and returns the names to keep;
+    only those cells are materialized.  Cells go through the same conversion and
+    parser as read_excel (blank rows inside the sheet are kept, trailing ones are
+    dropped); dtypes are inferred per chunk rather than per sheet.  Chunks are
+    indexed by row position in the sheet."""
+    ws.reset_dimensions()
+    rows = ws.iter_rows(values_only=True)
+    header = next(rows, None)
+    if header is None:
+        return
+    names = header_names(header)
+    wanted = set(keep_columns(names))
+    picks = [i for i, name in enumerate(names) if name in wanted]
+    columns = [names[i] for i in picks]
+    chunk = []
+    start = 0
+    blanks = 0
+    for row in rows:
+        if all(v is None for v in row):
+            # only kept if more data follows
+            blanks += 1
             continue
+        for _ in range(blanks):
+            chunk.append([""] * len(picks))
+        blanks = 0
+        chunk.append([excel_cell(row[i]) if i < len(row) else "" for i in picks])
+        if len(chunk) >= chunk_size:
+            yield parse_chunk(columns, chunk, start)
+            start += len(chunk)
+            chunk = []
+    if chunk:
+        yield parse_chunk(columns, chunk, start)
+
+
+def stream_sheet_chunks(wb, sheet, chunk_size, db, state, lock, schema):
+    """Yield the chunks of one sheet of a read-only workbook.  Columns that are
+    not in the target table (per schema, a SchemaCache) are never materialized.
+    Sheets imported in parallel share the workbook, so every read from it
+    happens under lock."""
+    def keep_columns(names):
+        rename = lesson_id_rename(sheet, names)
+        state["db_cols"] = schema.columns(db, sheet)
+        keep = [n for n in names if rename.get(n, n) in state["db_cols"]]
+        # modules keeps module_id for module_contents position mapping even if unused
+        if sheet == "modules" and "module_id" in names and "module_id" not in keep:
+            keep.append("module_id")
+        return keep
+
+    with lock:
+        chunks = iter_sheet_chunks(wb[sheet], chunk_size, keep_columns)
+    while True:
+        with lock:
+            df = next(chunks, None)
+        if df is None:
+            return
+        yield df
 
-        # Only convert HTML/JSON content columns; never transform link/URL columns (keep as-is)
-        link_like = {"link", "url", "video_url", "video_link", "lesson_link", "content_link"}
-        for col in [
-            "course_description",
-            "lesson_content",
-            "assessment_content",
-            "module_description",
-            "question_content"
-        ]:
-            if col in df.columns and col.lower() not in link_like:
-                df[col] = df[col].map(lambda x: json.dumps(content_to_json(x), ensure_ascii=False))
-
-        if sheet == "questions" and "answer_data" in df.columns:
-            df["answer_data"] = df["answer_data"].map(
-                lambda x: json.dumps(convert_answer_data(x), ensure_ascii=False)
-            )
 
-        # questions: convert correct_msg and incorrect_msg to JSON format (block content like question_content)
-        if sheet == "questions":
-            for col in ("correct_msg", "incorrect_msg"):
-                if col in df.columns:
-                    df[col] = df[col].map(lambda x: json.dumps(content_to_json(x), ensure_ascii=False))
-
-        # Ensure foreign keys are safe before insert
-        if sheet == "module_contents" and "lesson_id" in df.columns:
-            lesson_ids = get_id_set(cursor, "lessons", "lesson_id")
-            def fix_lesson_id(v):
-                if v is None:
-                    return None
-                try:
-                    if isinstance(v, float) and (v != v or pd.isna(v)):
-                        return None
-                    lid = int(float(v))
-                    return lid if lid in lesson_ids else None
-                except (ValueError, TypeError):
-                    return None
-            df["lesson_id"] = df["lesson_id"].map(fix_lesson_id)
-
-        if sheet == "module_contents" and "module_id" in df.columns:
-            # Excel may have different module_ids in modules vs module_contents — map by position
-            mod_df = pd.read_excel(excel_path, sheet_name="modules")
-            if "module_id" in mod_df.columns:
-                mod_ids = mod_df["module_id"].drop_duplicates().tolist()
-                mc_ids = df["module_id"].drop_duplicates().tolist()
-                mc_to_mod = dict(zip(mc_ids[: len(mod_ids)], mod_ids[: len(mc_ids)]))
-                def map_module_id(v):
-                    if v is None or (isinstance(v, float) and pd.isna(v)):
-                        return None
-                    try:
-                        mid = int(float(v))
-                        return mc_to_mod.get(mid, mid)
-                    except (ValueError, TypeError):
-                        return None
-                df["module_id"] = df["module_id"].map(map_module_id)
-            module_ids = get_id_set(cursor, "modules", "module_id")
-            def fix_module_id(v):
-                if v is None:
-                    return None
-                try:
-                    if isinstance(v, float) and (v != v or pd.isna(v)):
-                        return None
-                    mid = int(float(v))
-                    return mid if mid in module_ids else None
-                except (ValueError, TypeError):
-                    return None
-            df["module_id"] = df["module_id"].map(fix_module_id)
-            df = df[df["module_id"].notna()]
-            if df.empty:
-                logger.info(f"{sheet}: no rows with valid module_id after filtering; skipping")
-                continue
+# ==========================
+# SHEET PREPARATION
+# ==========================
+def lesson_id_rename(sheet, columns):
+    """Rename map that brings an Excel lesson ID header to lesson_id (lessons, module_contents)."""
+    columns = list(columns)
+    if sheet not in ("lessons", "module_contents") or "lesson_id" in columns:
+        return {}
+    # Lessons: use Excel lesson ID as lesson_id (add UNIQUE on lesson_id in DB to avoid duplicate rows on re-run)
+    # module_contents: ensure Excel lessonId/Lesson ID -> lesson_id so column is not dropped
+    if sheet == "lessons":
+        candidates = ["ID", "Id", "Lesson ID", "lessonID", "lessonId", "LessonId", "LESSON_ID", "Lesson_ID"]
+    else:
+        candidates = ["lessonId", "LessonId", "Lesson ID", "lessonID", "LESSON_ID", "Lesson_ID"]
+    for cand in candidates:
+        if cand in columns:
+            return {cand: "lesson_id"}
+    for c in columns:
+        if str(c).strip().lower() in ("lessonid", "lesson_id", "lesson id"):
+            return {c: "lesson_id"}
+    return {}
+
+
+# Foreign keys checked before insert: (sheet, column, referenced table, referenced column, policy).
+# policy "null" clears a dangling reference, "drop" removes the row.
+FK_RULES = [
+    ("module_contents", "lesson_id", "lessons", "lesson_id", "null"),
+    ("module_contents", "module_id", "modules", "module_id", "drop"),
+    ("module_contents", "assessment_id", "assessments", "assessment_id", "null"),
+    ("modules", "course_id", "courses", "course_id", "drop"),
+    ("lessons", "created_by", "editors", "editor_id", "null"),
+    ("assessments", "created_by", "editors", "editor_id", "null"),
+    ("questions", "created_by", "editors", "editor_id", "null"),
+    ("question_links", "assessment_id", "assessments", "assessment_id", "drop"),
+    ("question_links", "question_id", "questions", "question_id", "drop"),
+]
 
-        if sheet == "module_contents" and "assessment_id" in df.columns:
-            assessment_ids = get_id_set(cursor, "assessments", "assessment_id")
-            def fix_assessment_id(v):
-                if v is None:
-                    return None
-                try:
-                    if isinstance(v, float) and (v != v or pd.isna(v)):
-                        return None
-                    aid = int(float(v))
-                    return aid if aid in assessment_ids else None
-                except (ValueError, TypeError):
-                    return None
-            df["assessment_id"] = df["assessment_id"].map(fix_assessment_id)
 
-        def fix_created_by_col(editor_ids, series):
-            def fix(v):
-                if v is None:
-                    return None
-                try:
-                    if isinstance(v, float) and (v != v or pd.isna(v)):
-                        return None
-                    vid = int(float(v))
-                    return vid if vid in editor_ids else None
-                except (ValueError, TypeError):
-                    return None
-            return series.map(fix)
-
-        if sheet == "questions" and "created_by" in df.columns:
-            editor_ids = get_id_set(cursor, "editors", "editor_id")
-            df["created_by"] = fix_created_by_col(editor_ids, df["created_by"])
-
-        if sheet == "lessons" and "created_by" in df.columns:
-            editor_ids = get_id_set(cursor, "editors", "editor_id")
-            df["created_by"] = fix_created_by_col(editor_ids, df["created_by"])
-
-        if sheet == "assessments":
-            if "last_update" in df.columns:
-                now = pd.Timestamp.now().normalize()
-                df["last_update"] = pd.to_datetime(df["last_update"], errors="coerce").fillna(now)
-            if "created_by" in df.columns:
-                editor_ids = get_id_set(cursor, "editors", "editor_id")
-                df["created_by"] = fix_created_by_col(editor_ids, df["created_by"])
-
-        if sheet in ("lessons", "assessments") and "status" in df.columns:
-            def norm_status(v):
-                if v is None or (isinstance(v, float) and pd.isna(v)):
-                    return "draft"
-                s = str(v).strip().lower()
-                if s in ("", "nan", "null", "none"):
-                    return "draft"
-                if s in ("1", "published", "active", "yes"):
-                    return "published"
-                if s in ("0", "draft", "inactive", "no"):
-                    return "draft"
-                return s if s in ("draft", "published") else "draft"
-            df["status"] = df["status"].map(norm_status)
-
-        if sheet == "modules" and "course_id" in df.columns:
-            course_ids = get_id_set(cursor, "courses", "course_id")
-            def fix_module_course_id(v):
-                if v is None:
-                    return None
-                try:
-                    if isinstance(v, float) and (v != v or pd.isna(v)):
-                        return None
-                    cid = int(float(v))
-                    return cid if cid in course_ids else None
-                except (ValueError, TypeError):
-                    return None
-            df["course_id"] = df["course_id"].map(fix_module_course_id)
-            df = df[df["course_id"].notna()]
-            if df.empty:
-                logger.info(f"{sheet}: no rows with valid course_id after filtering; skipping")
-                continue
+def _float_or_nan(v):
+    try:
+        return float(v)
+    except (ValueError, TypeError):
+        return np.nan
+
+
+def to_id_series(series):
+    """int(float(v)) over an id column as float64; NaN where the value is
+    missing, not numeric or infinite.  Like int(float(v)), ids above 2**53 are
+    rounded to the nearest float."""
+    nums = pd.to_numeric(series, errors="coerce").astype("float64")
+    if not pd.api.types.is_numeric_dtype(series):
+        # float() accepts text to_numeric rejects, such as '1_000' and non-ASCII digits
+        rejected = nums.isna() & series.notna()
+        if rejected.any():
+            nums[rejected] = series[rejected].map(_float_or_nan).astype("float64")
+    return np.trunc(nums.where(np.isfinite(nums)))
+
+
+def add_written_ids(resolver, sheet, columns, rows):
+    """Count the ids other sheets refer to in rows written to sheet as present."""
+    for ref_table, ref_column in {(rule[2], rule[3]) for rule in FK_RULES}:
+        if ref_table == sheet and ref_column in columns:
+            i = columns.index(ref_column)
+            resolver.add(sheet, ref_column, to_id_series(pd.Series([row[i] for row in rows], dtype=object)).dropna())
+
+
+def apply_fk_rules(sheet, df, resolver, db=None):
+    """Null out or drop rows whose FK values are not in the referenced table.
+    Only the distinct ids of each column are checked, via resolver.resolve() on db."""
+    for rule_sheet, column, ref_table, ref_column, policy in FK_RULES:
+        if rule_sheet != sheet or column not in df.columns:
+            continue
+        ids = to_id_series(df[column])
+        existing = resolver.resolve(ref_table, ref_column, ids.dropna().unique(), db)
+        valid = ids.isin(existing)
+        df[column] = ids.where(valid)
+        if policy == "drop":
+            df = df[valid]
+    return df
 
-        if sheet == "courses":
-            now = pd.Timestamp.now().normalize()
-            if "publish_date" in df.columns:
-                df["publish_date"] = pd.to_datetime(df["publish_date"], errors="coerce").fillna(now)
-            if "last_update" in df.columns:
-                df["last_update"] = pd.to_datetime(df["last_update"], errors="coerce").fillna(now)
-
-        if sheet == "question_links":
-            if "assessment_id" in df.columns:
-                assessment_ids = get_id_set(cursor, "assessments", "assessment_id")
-                def fix_ql_assessment_id(v):
-                    if v is None:
-                        return None
-                    try:
-                        if isinstance(v, float) and (v != v or pd.isna(v)):
-                            return None
-                        aid = int(float(v))
-                        return aid if aid in assessment_ids else None
-                    except (ValueError, TypeError):
-                        return None
-                df["assessment_id"] = df["assessment_id"].map(fix_ql_assessment_id)
-                df = df[df["assessment_id"].notna()]
-            if "question_id" in df.columns:
-                question_ids = get_id_set(cursor, "questions", "question_id")
-                def fix_ql_question_id(v):
-                    if v is None:
-                        return None
-                    try:
-                        if isinstance(v, float) and (v != v or pd.isna(v)):
-                            return None
-                        qid = int(float(v))
-                        return qid if qid in question_ids else None
-                    except (ValueError, TypeError):
-                        return None
-                df["question_id"] = df["question_id"].map(fix_ql_question_id)
-                df = df[df["question_id"].notna()]
-            if df.empty:
-                logger.info(f"{sheet}: no rows with valid FKs after filtering; skipping")
-                continue
 
-        query = build_upsert_query(sheet, list(df.columns))
-
-        for idx, row in enumerate(df.itertuples(index=False, name=None)):
-            row_data = tuple(clean(v) for v in row)
-            for attempt in range(MAX_RECONNECT_RETRIES):
-                try:
-                    cursor.execute(query, row_data)
-                    break
-                except mysql.connector.Error as err:
-                    if err.errno == 2013 and attempt < MAX_RECONNECT_RETRIES - 1:
-                        logger.warning(f"{sheet} row {idx}: connection lost, reconnecting (attempt {attempt + 1})...")
-                        try:
-                            cursor.close()
-                            conn.close()
-                        except Exception:
-                            pass
-                        conn = get_connection()
-                        cursor = conn.cursor()
-                    else:
-                        logger.error(f"{sheet} row {idx} failed: {err}")
+# ==========================
+# SHEET ORDER
+# ==========================
+# Sheets each sheet refers to by id and must be imported after.  FK_RULES
+# references are added by sheet_dependencies(); the rest follow id columns the
+# sheets carry (category_id, subcategory_id, topic_id, created_by, assessment_id)
+# that the database schema may enforce.
+SHEET_DEPENDENCIES = {
+    'editors': [],
+    'categories': [],
+    'subcategories': ['categories'],
+    'topic_categories': ['subcategories'],
+    'courses': ['topic_categories', 'editors'],
+    'modules': ['courses', 'editors'],
+    'lessons': ['editors'],
+    'assessments': ['editors'],
+    'module_contents': ['modules', 'lessons', 'assessments'],
+    'questions': ['editors', 'assessments'],
+    'question_links': ['assessments', 'questions'],
+}
+
+
+def sheet_dependencies():
+    """SHEET_DEPENDENCIES plus every table referenced by FK_RULES, as sets."""
+    deps = {sheet: set(refs) for sheet, refs in SHEET_DEPENDENCIES.items()}
+    for sheet, _, ref_table, _, _ in FK_RULES:
+        deps.setdefault(sheet, set()).add(ref_table)
+    return deps
+
+
+def dependency_order(deps):
+    """Topological order of deps ({sheet: sheets it depends on}), taking the
+    first ready sheet in declaration order at each step.  References to tables
+    that are not sheets are ignored.  Raises ValueError on a cycle."""
+    order = []
+    remaining = list(deps)
+    while remaining:
+        ready = next((s for s in remaining if (deps[s] & set(deps)) <= set(order)), None)
+        if ready is None:
+            raise ValueError(f"Cyclic sheet dependencies between {remaining}")
+        order.append(ready)
+        remaining.remove(ready)
+    return order
+
+
+sheet_order = dependency_order(sheet_dependencies())
+
+
+def run_in_dependency_order(sheets, deps, task, workers):
+    """Call task(sheet) for every sheet once the sheets it depends on have
+    finished, running up to workers tasks at a time in threads; dependencies not
+    in sheets count as finished.  After a task fails no more sheets are started,
+    and its error is raised once the running ones have finished."""
+    if workers <= 1:
+        for sheet in sheets:
+            task(sheet)
+        return
+    wanted = set(sheets)
+    pending = list(sheets)
+    done = set()
+    running = {}
+    error = None
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="sheet") as executor:
+        while pending or running:
+            if error is None:
+                for sheet in [s for s in pending if (deps.get(s, set()) & wanted) <= done]:
+                    if len(running) >= workers:
                         break
-            if (idx + 1) % BATCH_SIZE == 0:
-                try:
-                    conn.commit()
-                    logger.info(f"{sheet}: committed batch up to row {idx + 1}")
-                except mysql.connector.Error as err:
-                    logger.error(f"{sheet} batch commit failed: {err}")
+                    pending.remove(sheet)
+                    running[executor.submit(task, sheet)] = sheet
+            if not running:
+                break
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                done.add(running.pop(future))
+                if error is None and future.exception() is not None:
+                    error = future.exception()
+    if error is not None:
+        raise error
+
+
+def _distinct_key(v):
+    return None if v is None or (isinstance(v, float) and v != v) else v
+
+
+def add_distinct(values, series, seen):
+    """Append series values not seen before to values, keeping first-seen order
+    (NaN counts once, as with drop_duplicates)."""
+    for v in series.drop_duplicates().tolist():
+        key = _distinct_key(v)
+        if key not in seen:
+            seen.add(key)
+            values.append(v)
+
+
+def track_module_ids(sheet, df, state, run):
+    """Collect the module ids the module_contents position mapping needs from a
+    raw chunk, before any of its rows are skipped or converted."""
+    if sheet == "modules" and "module_id" in df.columns:
+        add_distinct(run.setdefault("excel_module_ids", []), df["module_id"],
+                     state.setdefault("module_id_keys", set()))
+    if sheet == "module_contents" and "module_id" in df.columns:
+        # positions of module_contents ids count rows written by earlier runs too
+        add_distinct(state.setdefault("mc_seen", []), df["module_id"], state.setdefault("mc_seen_keys", set()))
+
+
+def conversion_jobs(sheet, columns):
+    """(content jobs, answer_data jobs) of a sheet with these columns: the
+    (column, converter) pairs convert_columns applies to it."""
+    # Only convert HTML/JSON content columns; never transform link/URL columns (keep as-is)
+    link_like = {"link", "url", "video_url", "video_link", "lesson_link", "content_link"}
+    jobs = [(col, content_cell_json) for col in [
+        "course_description",
+        "lesson_content",
+        "assessment_content",
+        "module_description",
+        "question_content"
+    ] if col in columns and col.lower() not in link_like]
+
+    # questions: convert correct_msg and incorrect_msg to JSON format (block content like question_content)
+    if sheet == "questions":
+        jobs.extend((col, content_cell_json) for col in ("correct_msg", "incorrect_msg") if col in columns)
+
+    if sheet == "questions" and "answer_data" in columns:
+        answer_jobs = [("answer_data", answer_cell_json)]
+    else:
+        answer_jobs = []
+    return jobs, answer_jobs
+
+
+def preconvert_frames(frames):
+    """Convert the content and answer_data cells of whole-sheet frames ahead of
+    an import (e.g. in another process) and return the results as
+    ConversionCache entries, [(key, converted)].  An import whose cache holds
+    them converts nothing; the frames themselves are left unchanged."""
+    cache = ConversionCache(max_size=sys.maxsize, path="")
+    for sheet, df in frames.items():
+        # content columns are never renamed, so the raw headers select the same jobs
+        jobs, answer_jobs = conversion_jobs(sheet, df.columns)
+        if jobs or answer_jobs:
+            convert_columns(df[[col for col, _ in jobs + answer_jobs]].copy(), jobs + answer_jobs, None, cache)
+    return list(cache.memory.items())
+
+
+def prepare_sheet_frame(db, sheet, df, state, run):
+    """Apply renames, column filtering, content conversion and FK fixes to one
+    frame (a whole sheet or one chunk of it).  state persists across chunks of
+    the same sheet; run persists across sheets (run["fk"] is the FkResolver,
+    run["schema"] the SchemaCache, run["metrics"] the ImportMetrics).  db may be
+    None when both are offline (dry run).  Returns None if nothing is left to
+    write."""
+    rename = lesson_id_rename(sheet, df.columns)
+    if rename:
+        df = df.rename(columns=rename)
+    if sheet == "lessons" and "lesson_id" in df.columns:
+        df["lesson_id"] = df["lesson_id"].map(clean)
+
+    if "db_cols" not in state:
+        state["db_cols"] = run["schema"].columns(db, sheet)
+    db_cols = state["db_cols"]
+    df = df[[c for c in df.columns if c in db_cols]]
+
+    if df.empty:
+        return None
 
-        try:
-            conn.commit()
-        except mysql.connector.Error as err:
-            logger.error(f"{sheet} final commit failed: {err}")
+    jobs, answer_jobs = conversion_jobs(sheet, df.columns)
+    measure = run["metrics"]
+    cache = state.get("cache", run.get("cache"))
+    source = df[[col for col, _ in jobs + answer_jobs]]
+    if jobs:
+        with measure.stage("convert_content", sheet):
+            df = convert_columns(df, jobs, run.get("pool"), cache)
+    if answer_jobs:
+        with measure.stage("convert_answer", sheet):
+            df = convert_columns(df, answer_jobs, run.get("pool"), cache)
+    if jobs or answer_jobs:
+        measure.add(sheet, conversion_failures=sum(
+            count_failed_conversions(source[col], df[col], func) for col, func in jobs + answer_jobs))
+
+    if sheet == "module_contents" and "module_id" in df.columns:
+        # Excel may have different module_ids in modules vs module_contents — map by position
+        mod_ids = run.get("excel_module_ids")
+        if mod_ids is not None:
+            # positions are assigned in first-seen order across all chunks of the sheet
+            # (import_sheet collects mc_seen before rows are resumed past or converted)
+            mc_to_mod = state.setdefault("mc_to_mod", {})
+            mc_seen = state.setdefault("mc_seen", [])
+            for pos in range(len(mc_to_mod), min(len(mc_seen), len(mod_ids))):
+                mc_to_mod[_distinct_key(mc_seen[pos])] = mod_ids[pos]
+            # only numeric Excel ids can match the truncated ids being looked up
+            numeric_map = {k: v for k, v in mc_to_mod.items() if isinstance(k, (int, float, np.number))}
+            mids = to_id_series(df["module_id"])
+            known = mids.isin(list(numeric_map))
+            df["module_id"] = mids.map(numeric_map).where(known, mids)
+
+    if sheet == "assessments":
+        if "last_update" in df.columns:
+            now = pd.Timestamp.now().normalize()
+            df["last_update"] = pd.to_datetime(df["last_update"], errors="coerce").fillna(now)
+
+    if sheet in ("lessons", "assessments") and "status" in df.columns:
+        df["status"] = normalize_status(df["status"])
+
+    if sheet == "courses":
+        now = pd.Timestamp.now().normalize()
+        if "publish_date" in df.columns:
+            df["publish_date"] = pd.to_datetime(df["publish_date"], errors="coerce").fillna(now)
+        if "last_update" in df.columns:
+            df["last_update"] = pd.to_datetime(df["last_update"], errors="coerce").fillna(now)
+
+    # Ensure foreign keys are safe before insert
+    checked = [rule for rule in FK_RULES if rule[0] == sheet and rule[1] in df.columns]
+    rows_in = len(df)
+    with measure.stage("fk", sheet):
+        df = apply_fk_rules(sheet, df, run["fk"], db)
+    measure.add(sheet, rows_dropped_fk=rows_in - len(df))
+    if df.empty:
+        dropping = ", ".join(rule[1] for rule in checked if rule[4] == "drop")
+        logger.info(f"{sheet}: no rows with valid {dropping or 'FKs'} after filtering; skipping")
+        return None
+
+    return df
+
+
+def import_sheet(db, sheet, chunks, state, run, bulk, max_packet, report):
+    """Prepare and write every chunk of one sheet on db.
+
+    Rows before state["resume_from"] (a checkpoint offset) are read but not
+    written again, nor is any row with state["finished"].  With
+    run["checkpoints"], the sheet's checkpoint is moved past every committed
+    batch and marked done at the end."""
+    logger.info(f"Processing {sheet}")
+    report(sheet, "start")
+    cache = state["cache"] = run["cache"].view()
+    fingerprints = run.get("fingerprints")
+    checkpoints = run.get("checkpoints")
+    measure = run["metrics"]
+    counts = {"inserted": 0, "updated": 0, "skipped": 0, "repeated": 0}
+    resume_from = state.get("resume_from", 0)
+    finished = state.get("finished", False)
+    if finished:
+        logger.info(f"{sheet}: already imported (checkpoint); reading module ids only")
+    elif resume_from:
+        logger.info(f"{sheet}: resuming at row {resume_from} from checkpoint")
+    offset = resume_from
+    imported = False
+
+    def checkpoint(end, done=False):
+        nonlocal offset
+        offset = max(offset, end)
+        # after a lost commit the rows behind it must be written again
+        if checkpoints is not None and not state.get("checkpoint_lost"):
+            checkpoints.save(run["digest"], sheet, offset, done)
+
+    chunks = iter(chunks)
+    while True:
+        with measure.stage("read", sheet):
+            df = next(chunks, None)
+        if df is None:
+            break
+        if df.empty:
+            continue
+        chunk_end = int(df.index[-1]) + 1
+        track_module_ids(sheet, df, state, run)
+        if finished or chunk_end <= resume_from:
+            continue
+        if resume_from:
+            df = df[df.index >= resume_from]
+        measure.add(sheet, rows_in=len(df))
+
+        df = prepare_sheet_frame(db, sheet, df, state, run)
+        if df is None:
+            checkpoint(chunk_end)
+            continue
+
+        report(sheet, "processed", len(df))
+        columns = list(df.columns)
+        positions = df.index
+        with measure.stage("clean", sheet):
+            rows = zip(*[clean_column(df.iloc[:, i]) for i in range(len(columns))])
+        key_idx = None
+        if fingerprints is not None:
+            if "fingerprint_key" not in state:
+                state["fingerprint_key"] = fingerprint_key(run["schema"].unique_keys(db, sheet), columns)
+                if state["fingerprint_key"] is None:
+                    logger.warning(f"{sheet}: no unique key among the sheet columns; writing every row")
+            key_idx = state["fingerprint_key"]
+        if key_idx is not None:
+            with measure.stage("fingerprint", sheet):
+                rows = list(rows)
+                keep = split_unchanged_rows(fingerprints, sheet, columns, key_idx, rows, counts,
+                                            state.setdefault("fingerprint_seen", set()))
+                rows = [rows[i] for i in keep]
+                positions = positions[keep]
+            report(sheet, "skipped", len(df) - len(rows))
+            measure.add(sheet, rows_skipped=len(df) - len(rows))
+            if not rows:
+                checkpoint(chunk_end)
+                continue
+
+        def committed(written, done):
+            report(sheet, "committed", len(written))
+            measure.add(sheet, rows_out=len(written))
+            add_written_ids(run["fk"], sheet, columns, written)
+            if key_idx is not None:
+                record_fingerprints(fingerprints, sheet, columns, key_idx, written)
+            if done is None:
+                state["checkpoint_lost"] = True
+            else:
+                # rows between the last written one and the next were dropped or skipped on purpose
+                checkpoint(int(positions[done]) if done < len(positions) else chunk_end)
+
+        with measure.stage("write", sheet):
+            if bulk:
+                rows = list(rows)
+                if bulk_load_rows(db, sheet, columns, rows):
+                    committed(rows, len(rows))
+                    imported = True
+                    continue
+            write_rows(db, sheet, columns, rows, max_packet, on_commit=committed)
+        imported = True
+        del df, rows
+
+    if not finished:
+        checkpoint(offset, done=True)
+
+    if cache.hits or cache.misses:
+        logger.info(f"{sheet}: conversion cache {cache.hits} hits "
+                    f"({cache.disk_hits} distinct values from disk), {cache.misses} misses")
+    if state.get("fingerprint_key") is not None:
+        logger.info(f"{sheet}: {counts['inserted']} inserted, {counts['updated']} updated, "
+                    f"{counts['skipped']} skipped (unchanged)")
+        if counts["repeated"]:
+            logger.warning(f"{sheet}: {counts['repeated']} rows repeat a key from an earlier chunk; both rows "
+                           f"are written on every incremental import (without IMPORT_CHUNK_SIZE only the "
+                           f"last one is)")
+    if imported:
         logger.info(f"{sheet} imported successfully")
+    report(sheet, "done")
+
+
+def validate_sheet(sheet, chunks, state, run, report):
+    """Dry run of import_sheet: prepare every chunk of one sheet against the
+    offline schema and FK ids in run, without a database.  The ids of the rows
+    that would be written are added to run["fk"] for the sheets that refer to
+    them."""
+    logger.info(f"Validating {sheet}")
+    report(sheet, "start")
+    state["cache"] = run["cache"].view()
+    measure = run["metrics"]
+    chunks = iter(chunks)
+    while True:
+        with measure.stage("read", sheet):
+            df = next(chunks, None)
+        if df is None:
+            break
+        track_module_ids(sheet, df, state, run)
+        measure.add(sheet, rows_in=len(df))
+        df = prepare_sheet_frame(None, sheet, df, state, run)
+        if df is None:
+            continue
+        report(sheet, "processed", len(df))
+        measure.add(sheet, rows_out=len(df))
+        for _, _, ref_table, ref_column, _ in FK_RULES:
+            if ref_table == sheet and ref_column in df.columns:
+                run["fk"].add(sheet, ref_column, to_id_series(df[ref_column]).dropna())
+    report(sheet, "done")
 
-    # cleanup after all sheets
-    cursor.close()
-    conn.close()
-    logger.info("IMPORT COMPLETED SUCCESSFULLY")
 
+def import_excel(excel_path, bulk=None, chunk_size=None, convert_workers=None, progress=None,
+                 sheet_workers=None, incremental=None, profile=None, resume=None, digest=None,
+                 dry_run=False, schema=None, engine=None, frames=None, cache=None):
+    """Main entry point used by the Flask UI.  Takes a path to an Excel file and
+    imports its sheets into the configured MySQL/MariaDB database.  Instead of
+    a workbook the path may hold one CSV or Parquet file per sheet, named after
+    its table (a .zip of them, a directory, or a single file; see
+    load_table_frames); they go through the same pipeline.  ``engine`` (default:
+    IMPORT_EXCEL_ENGINE) picks the reader for whole-sheet workbook reads.
+    ``frames`` ({sheet: DataFrame} as read_frames returns) are imported instead
+    of reading the file again; excel_path then only names the source (and is
+    hashed for checkpoints unless ``digest`` is given).  ``cache`` is a
+    ConversionCache to convert through instead of a fresh one (e.g. seeded with
+    preconvert_frames); the caller closes it.
+
+    With ``bulk=True`` (default: the IMPORT_BULK_LOAD env var) each sheet is sent
+    with LOAD DATA LOCAL INFILE into a staging table instead of batched INSERTs.
+    With ``chunk_size`` (default: the IMPORT_CHUNK_SIZE env var) .xlsx sheets are
+    streamed and processed chunk by chunk, so memory is bounded by the chunk size.
+    ``convert_workers`` (default: IMPORT_CONVERT_WORKERS) runs content conversion
+    in that many processes ("auto" = all available cores).
+    ``sheet_workers`` (default: IMPORT_SHEET_WORKERS) imports up to that many
+    sheets at a time, each on its own connection, starting a sheet only once
+    the sheets it depends on (SHEET_DEPENDENCIES) have been written.
+    With ``incremental=True`` (default: IMPORT_INCREMENTAL) rows whose fingerprint
+    matches the one recorded by a previous import (RowFingerprints) are skipped.
+    Progress is checkpointed per sheet after every committed batch
+    (ImportCheckpoints, keyed by ``digest``, the SHA-256 of the file, computed
+    if not given).  With ``resume=True`` (default: IMPORT_RESUME) an import of
+    a file that failed before continues after its last committed batch instead
+    of starting over; with ``resume=False`` its checkpoints are discarded.
+    With ``dry_run=True`` nothing is written and no database is used: the
+    sheets are parsed, renamed, converted and FK-filtered against ``schema``
+    (a schema snapshot path, default IMPORT_SCHEMA_SNAPSHOT, or a SchemaCache),
+    and the summary reports rows in/out, rows dropped by FK rules and
+    conversion failures per sheet.
+
+    ``progress`` is called as ``progress(sheet, stage, rows)`` while the import
+    runs: stage "start" and "done" bracket each sheet, "processed" reports rows
+    prepared for writing, "skipped" unchanged rows left out in incremental mode
+    and "committed" rows committed to the database.
+
+    Returns the import's metrics summary (see metrics.ImportMetrics): duration
+    of each stage, rows in/out, rows dropped by FK rules, round trips and bytes
+    sent per sheet.  It is also written as JSON to IMPORT_METRICS_DIR, also when
+    the import fails.  With ``profile`` (a file path) the import runs under
+    cProfile and the merged stats of all its threads are dumped there."""
+    if bulk is None:
+        bulk = BULK_LOAD
+    if chunk_size is None:
+        chunk_size = CHUNK_SIZE
+    if sheet_workers is None:
+        sheet_workers = SHEET_WORKERS
+    if incremental is None:
+        incremental = INCREMENTAL
+    if resume is None:
+        resume = RESUME
+    if frames is not None:
+        # read whole already
+        chunk_size = 0
+    elif chunk_size and (input_format(excel_path) != "excel" or not str(excel_path).lower().endswith(".xlsx")):
+        logger.warning("Streaming import needs an .xlsx workbook; reading whole sheets instead")
+        chunk_size = 0
+    if dry_run:
+        schema = schema if isinstance(schema, SchemaCache) else load_schema_snapshot(schema)
+        max_packet = None
+    else:
+        schema = schema or get_schema()
+        db = DbSession(local_infile=bulk)
+        logger.info("Connected to MariaDB")
+        try:
+            max_packet = get_max_allowed_packet(db.cursor)
+        finally:
+            db.close()
+
+    measure = metrics.ImportMetrics(excel_path)
+    profiler = metrics.Profiler() if profile else None
+    run = {"fk": FkResolver(known=schema.ids) if dry_run else FkResolver(), "schema": schema,
+           "pool": make_convert_pool(convert_workers), "cache": cache if cache is not None else ConversionCache(),
+           "fingerprints": RowFingerprints() if incremental and not dry_run else None, "metrics": measure,
+           "checkpoints": ImportCheckpoints() if CHECKPOINT_PATH and not dry_run else None}
+    resume_at = {}
+    if run["checkpoints"] is not None:
+        run["digest"] = digest or file_digest(excel_path)
+        if resume:
+            resume_at = run["checkpoints"].load(run["digest"])
+        else:
+            run["checkpoints"].clear(run["digest"])
+    wb = None
+    error = None
+
+    def report(sheet, stage, rows=0):
+        if progress is not None:
+            progress(sheet, stage, rows)
+
+    def task(sheet):
+        if dry_run:
+            start = time.perf_counter()
+            state = {}
+            try:
+                validate_sheet(sheet, chunks_for(sheet, None, state), state, run, report)
+            finally:
+                measure.add(sheet, duration=time.perf_counter() - start)
+            return
+        # each sheet borrows its own pooled connection
+        start = time.perf_counter()
+        session = DbSession(local_infile=bulk)
+        try:
+            offset, done = resume_at.get(sheet, (0, False))
+            # a finished sheet is still read when it feeds a mapping (modules -> module_contents)
+            state = {"resume_from": offset, "finished": done}
+            import_sheet(session, sheet, chunks_for(sheet, session, state), state, run, bulk, max_packet, report)
+        finally:
+            session.close()
+            measure.add(sheet, duration=time.perf_counter() - start, **session.stats)
+
+    def read_workbook():
+        with measure.stage("read"):
+            if chunk_size:
+                return openpyxl.load_workbook(excel_path, read_only=True, data_only=True)
+            return read_frames(excel_path, engine)
+
+    try:
+        if frames is not None:
+            loaded = dict(frames)
+        else:
+            loaded = read_workbook() if profiler is None else profiler.run(read_workbook)
+        if chunk_size:
+            wb = loaded
+            logger.info(f"Sheets found: {wb.sheetnames}")
+            present = set(wb.sheetnames)
+            read_lock = threading.Lock()
+
+            def chunks_for(sheet, session, state):
+                return stream_sheet_chunks(wb, sheet, chunk_size, session, state, read_lock, schema)
+        else:
+            present = set(loaded)
+
+            def chunks_for(sheet, session, state):
+                return [loaded.pop(sheet)]
+
+        finished = {sheet for sheet, (_, done) in resume_at.items() if done}
+        if resume_at:
+            logger.info(f"Resuming import from checkpoints; finished sheets: {sorted(finished) or 'none'}")
+        if "module_contents" not in finished:
+            finished.discard("modules")
+        sheets = [sheet for sheet in sheet_order if sheet in present and sheet not in finished]
+        run_in_dependency_order(sheets, sheet_dependencies(),
+                                task if profiler is None else (lambda sheet: profiler.run(task, sheet)),
+                                sheet_workers)
+    except Exception as e:
+        error = e
+        raise
+    finally:
+        # cleanup after all sheets
+        if wb is not None:
+            wb.close()
+        if run["pool"] is not None:
+            run["pool"].shutdown()
+        if cache is None:
+            run["cache"].close()
+        if run["fingerprints"] is not None:
+            run["fingerprints"].close()
+        if run["checkpoints"] is not None:
+            if error is None:
+                run["checkpoints"].clear(run["digest"])
+            else:
+                logger.info("Import failed; committed batches are checkpointed and a retry resumes after them")
+            run["checkpoints"].close()
+        summary = measure.summary("failed" if error else "succeeded", str(error) if error else None)
+        if dry_run:
+            # not an import: kept out of the totals and the metrics files
+            summary["dry_run"] = True
+            logger.info(f"Dry run took {summary['duration']:.2f}s")
+        else:
+            logger.info(f"Connection pool: {get_pool().metrics()}")
+            metrics.record(summary)
+            path = metrics.write_summary(summary)
+            logger.info(f"Import took {summary['duration']:.2f}s" + (f"; metrics written to {path}" if path else ""))
+        if profiler is not None:
+            profiler.dump(profile)
+    logger.info("DRY RUN COMPLETED" if dry_run else "IMPORT COMPLETED SUCCESSFULLY")
+    return summary
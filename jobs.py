@@ -0,0 +1,315 @@
+"""Background import jobs for the Flask app.
+
+Uploads are queued on a bounded thread pool that runs import_excel, so the
+upload request returns at once.  Each job's status and per-sheet progress is
+kept in an in-process store that the status endpoint reads while it runs.
+Uploads are indexed by content hash, so an exact re-upload of a workbook that
+is queued, running or already imported is answered with the earlier job.
+A failed job can be resumed, continuing after its last checkpointed batch;
+every other import, re-uploads included, starts from the first sheet.
+"""
+import copy
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+from import_utils import import_excel, get_checkpoints, discard_checkpoints
+
+logger = logging.getLogger(__name__)
+
+# ==========================
+# CONFIG
+# ==========================
+# Imports that run at the same time; further uploads wait in the queue
+JOB_WORKERS = int(os.environ.get('IMPORT_JOB_WORKERS', 2))
+# Finished jobs kept for the status endpoint (oldest are dropped first)
+JOB_HISTORY = int(os.environ.get('IMPORT_JOB_HISTORY', 100))
+# SQLite file mapping upload content hashes to the job that imported them
+UPLOAD_INDEX_PATH = os.environ.get('IMPORT_UPLOAD_INDEX_PATH', 'upload_index.sqlite')
+
+FINISHED = ("succeeded", "failed")
+
+_executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="import-job")
+_jobs = OrderedDict()
+_lock = threading.Lock()
+_index = None
+
+
+# ==========================
+# UPLOAD INDEX
+# ==========================
+def _upload_index():
+    # called with _lock held
+    global _index
+    if _index is None:
+        _index = sqlite3.connect(UPLOAD_INDEX_PATH, check_same_thread=False)
+        _index.execute(
+            "CREATE TABLE IF NOT EXISTS uploads (digest TEXT PRIMARY KEY, job_id TEXT NOT NULL, "
+            "filename TEXT, path TEXT, status TEXT, error TEXT, created REAL, started REAL, finished REAL)"
+        )
+        _index.execute("CREATE INDEX IF NOT EXISTS uploads_job_id ON uploads (job_id)")
+        _index.commit()
+    return _index
+
+
+def _indexed(column, value):
+    # called with _lock held
+    cur = _upload_index().execute(
+        f"SELECT digest, job_id, filename, path, status, error, created, started, finished "
+        f"FROM uploads WHERE {column} = ?", (value,)
+    )
+    row = cur.fetchone()
+    if row is None:
+        return None
+    return dict(zip([d[0] for d in cur.description], row))
+
+
+def _index_job(job):
+    # called with _lock held
+    if job.get("digest") is None:
+        return
+    _upload_index().execute(
+        "INSERT OR REPLACE INTO uploads (digest, job_id, filename, path, status, error, created, started, finished) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        (job["digest"], job["id"], job["filename"], job["path"], job["status"], job["error"],
+         job["created"], job["started"], job["finished"])
+    )
+    _upload_index().commit()
+
+
+def _find_duplicate(digest):
+    """Job id of an earlier upload with the same content hash that is queued or
+    running in this process or was imported successfully, else None.  Failed
+    imports, and jobs left unfinished by an earlier process, do not count.
+    Called with _lock held."""
+    entry = _indexed("digest", digest)
+    if entry is None:
+        return None
+    job = _jobs.get(entry["job_id"])
+    status = job["status"] if job is not None else entry["status"]
+    if status == "succeeded" or (job is not None and status not in FINISHED):
+        return entry["job_id"]
+    return None
+
+
+def submit_upload(part_path, filename, digest, folder, force=False, profile=False):
+    """Queue the import of an upload streamed to part_path with content hash
+    digest, and return (job id, duplicate).
+
+    Unless force is set, an exact re-upload (see _find_duplicate) is not imported
+    again: part_path is removed and the earlier job id is returned with
+    duplicate=True.  Otherwise the file is kept once per content hash, as
+    ``<folder>/<digest>.<ext>``, and a new job is queued.  With profile the
+    import runs under cProfile and the stats are dumped to
+    ``<METRICS_DIR>/<job_id>.prof`` (the job's "profile" field)."""
+    ext = filename.rsplit('.', 1)[1].lower() if '.' in filename else ''
+    with _lock:
+        existing = None if force else _find_duplicate(digest)
+        if existing is not None:
+            os.remove(part_path)
+            logger.info(f"{filename} is a re-upload of job {existing} ({digest[:12]}); not importing again")
+            return existing, True
+        path = os.path.join(folder, f"{digest}.{ext}" if ext else digest)
+        if os.path.exists(path):
+            os.remove(part_path)
+        else:
+            os.replace(part_path, path)
+        job_id = _add_job(path, filename, digest=digest, profile=profile)
+    _executor.submit(_run, job_id, path)
+    logger.info(f"Queued import job {job_id} for {filename}")
+    return job_id, False
+
+
+# ==========================
+# JOB STORE
+# ==========================
+def new_job_id():
+    return uuid.uuid4().hex
+
+
+def _add_job(excel_path, filename, job_id=None, digest=None, profile=False):
+    # called with _lock held
+    job_id = job_id or new_job_id()
+    job = {
+        "id": job_id,
+        "filename": filename,
+        "path": excel_path,
+        "digest": digest,
+        "status": "queued",
+        "error": None,
+        "created": time.time(),
+        "started": None,
+        "finished": None,
+        "sheets": OrderedDict(),
+        "metrics": None,
+        "profile": os.path.join(metrics.METRICS_DIR or ".", f"{job_id}.prof") if profile else None,
+    }
+    _jobs[job_id] = job
+    _index_job(job)
+    _prune()
+    return job_id
+
+
+def get_job(job_id):
+    """Snapshot of one job (with elapsed times), or None if it is unknown.
+    Jobs no longer kept in memory are answered from the upload index, without
+    per-sheet progress.  A failed job's "checkpoint" maps the sheets it got to
+    to {"offset", "done"}: where resume_job() would continue."""
+    with _lock:
+        job = _jobs.get(job_id)
+        data = _snapshot(job) if job is not None else _indexed_job(job_id)
+    if data is None:
+        return None
+    if data["status"] == "failed" and data.get("digest"):
+        data["checkpoint"] = {sheet: {"offset": offset, "done": done}
+                              for sheet, (offset, done) in get_checkpoints(data["digest"]).items()}
+    return data
+
+
+def _indexed_job(job_id):
+    # called with _lock held
+    entry = _indexed("job_id", job_id)
+    if entry is None:
+        return None
+    job = dict(entry, id=entry.pop("job_id"), sheets=OrderedDict())
+    if job["status"] not in FINISHED:
+        # queued or running when an earlier app process stopped
+        job.update(status="failed", error=job["error"] or "interrupted")
+    return _snapshot(job)
+
+
+def resume_job(job_id):
+    """Queue a failed job again under the same id.  The import continues after
+    the batches its earlier run committed (see import_excel's checkpoints).
+    Returns True if queued, False if the job is not failed (or its file is
+    gone) and None if it is unknown."""
+    with _lock:
+        job = _jobs.get(job_id)
+        if job is None:
+            entry = _indexed_job(job_id)
+            if entry is None:
+                return None
+            if entry["status"] != "failed" or not os.path.exists(entry["path"]):
+                return False
+            _add_job(entry["path"], entry["filename"], job_id, entry["digest"])
+            path = entry["path"]
+        else:
+            if job["status"] != "failed":
+                return False
+            job.update(status="queued", error=None, started=None, finished=None, sheets=OrderedDict(),
+                       metrics=None)
+            # now the newest job, so pruning keeps it
+            _jobs.move_to_end(job_id)
+            _index_job(job)
+            path = job["path"]
+    _executor.submit(_run, job_id, path, True)
+    logger.info(f"Resuming import job {job_id}")
+    return True
+
+
+def discard_checkpoint(job_id):
+    """Forget a failed job's checkpoints, so resuming or re-uploading its file
+    imports every sheet from the start.  Returns True if done, False if the job
+    is not failed and None if it is unknown."""
+    job = get_job(job_id)
+    if job is None:
+        return None
+    if job["status"] != "failed":
+        return False
+    if job.get("digest"):
+        discard_checkpoints(job["digest"])
+    return True
+
+
+def list_jobs():
+    """Snapshots of all kept jobs, newest first."""
+    with _lock:
+        return [_snapshot(job) for job in reversed(_jobs.values())]
+
+
+def _prune():
+    finished = [job_id for job_id, job in _jobs.items() if job["status"] in FINISHED]
+    for job_id in finished[:max(0, len(_jobs) - JOB_HISTORY)]:
+        del _jobs[job_id]
+
+
+def _elapsed(started, finished, now):
+    if started is None:
+        return None
+    return round((finished or now) - started, 2)
+
+
+def _snapshot(job):
+    now = time.time()
+    data = copy.deepcopy(job)
+    data["elapsed"] = _elapsed(job["started"], job["finished"], now)
+    data["sheets"] = [
+        dict(sheet, name=name, elapsed=_elapsed(sheet["started"], sheet["finished"], now))
+        for name, sheet in data["sheets"].items()
+    ]
+    # several sheets run at once when they do not depend on each other
+    data["current_sheets"] = [sheet["name"] for sheet in data["sheets"] if sheet["status"] == "running"]
+    data["current_sheet"] = data["current_sheets"][-1] if data["current_sheets"] else None
+    return data
+
+
+# ==========================
+# RUNNER
+# ==========================
+def _progress(job_id, sheet, stage, rows):
+    with _lock:
+        job = _jobs.get(job_id)
+        if job is None:
+            return
+        if stage == "start":
+            job["sheets"][sheet] = {
+                "status": "running", "rows_processed": 0, "rows_skipped": 0, "rows_committed": 0,
+                "started": time.time(), "finished": None,
+            }
+            return
+        progress = job["sheets"].get(sheet)
+        if progress is None:
+            return
+        if stage == "processed":
+            progress["rows_processed"] += rows
+        elif stage == "skipped":
+            progress["rows_skipped"] += rows
+        elif stage == "committed":
+            progress["rows_committed"] += rows
+        elif stage == "done":
+            progress["status"] = "done"
+            progress["finished"] = time.time()
+
+
+def _set(job_id, **fields):
+    with _lock:
+        job = _jobs.get(job_id)
+        if job is not None:
+            job.update(fields)
+            _index_job(job)
+
+
+def _run(job_id, excel_path, resume=False):
+    _set(job_id, status="running", started=time.time())
+    with _lock:
+        profile = _jobs[job_id]["profile"]
+        digest = _jobs[job_id]["digest"]
+    try:
+        summary = import_excel(excel_path, profile=profile, digest=digest, resume=resume,
+                               progress=lambda sheet, stage, rows: _progress(job_id, sheet, stage, rows))
+    except Exception as e:
+        logger.exception(f"Import job {job_id} failed")
+        with _lock:
+            for progress in _jobs[job_id]["sheets"].values():
+                if progress["status"] == "running":
+                    progress.update(status="failed", finished=time.time())
+        _set(job_id, status="failed", error=str(e), finished=time.time())
+    else:
+        logger.info(f"Import job {job_id} finished")
+        _set(job_id, status="succeeded", finished=time.time(), metrics=summary)
@@ -0,0 +1,222 @@
+"""Per-stage timing and counters for imports.
+
+import_excel records an ImportMetrics per run: time spent in each stage and
+row, round-trip and byte counts per sheet.  The summary of every finished
+import is written as JSON to METRICS_DIR and added to process-wide totals
+that the Flask app serves in the Prometheus text format.
+"""
+import cProfile
+import copy
+import datetime
+import json
+import logging
+import os
+import pstats
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# ==========================
+# CONFIG
+# ==========================
+# Directory for the per-import JSON summaries (and cProfile dumps); empty disables the files
+METRICS_DIR = os.environ.get('IMPORT_METRICS_DIR', 'import_metrics')
+
+SHEET_COUNTERS = ("rows_in", "rows_dropped_fk", "rows_skipped", "rows_out", "rows_replayed", "conversion_failures",
+                  "round_trips", "bytes_sent")
+
+
+class ImportMetrics:
+    """Stage durations and counters of one import.  Stages recorded without a
+    sheet (e.g. parsing the workbook) belong to the import as a whole.  Safe to
+    share between sheets imported in parallel."""
+
+    def __init__(self, source):
+        self.source = source
+        self.started = time.time()
+        self.start = time.perf_counter()
+        self.stages = OrderedDict()
+        self.sheets = OrderedDict()
+        self.lock = threading.Lock()
+
+    def _sheet(self, sheet):
+        # called with self.lock held
+        if sheet not in self.sheets:
+            self.sheets[sheet] = dict({"duration": 0.0, "stages": OrderedDict()},
+                                      **{name: 0 for name in SHEET_COUNTERS})
+        return self.sheets[sheet]
+
+    @contextmanager
+    def stage(self, name, sheet=None):
+        """Add the time spent in the with block to stage name."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start, sheet)
+
+    def add_time(self, name, seconds, sheet=None):
+        with self.lock:
+            stages = self.stages if sheet is None else self._sheet(sheet)["stages"]
+            stages[name] = stages.get(name, 0.0) + seconds
+
+    def add(self, sheet, **counts):
+        with self.lock:
+            data = self._sheet(sheet)
+            for name, value in counts.items():
+                data[name] += value
+
+    def summary(self, status="succeeded", error=None):
+        with self.lock:
+            sheets = OrderedDict()
+            for name, data in self.sheets.items():
+                sheets[name] = dict(data, duration=round(data["duration"], 4),
+                                    stages={k: round(v, 4) for k, v in data["stages"].items()})
+            return {
+                "source": self.source,
+                "status": status,
+                "error": error,
+                "started": datetime.datetime.fromtimestamp(self.started).isoformat(timespec="seconds"),
+                "duration": round(time.perf_counter() - self.start, 4),
+                "stages": {k: round(v, 4) for k, v in self.stages.items()},
+                "sheets": sheets,
+            }
+
+
+def write_summary(summary, directory=None):
+    """Write summary as <started>_<source name>_<random>.json in directory (default:
+    METRICS_DIR) and return the path, or None when disabled or on error."""
+    directory = METRICS_DIR if directory is None else directory
+    if not directory:
+        return None
+    name = re.sub(r"[^\w.-]", "_", os.path.basename(str(summary["source"])))
+    # the suffix keeps imports of the same file started in the same second apart
+    path = os.path.join(directory, f"{summary['started'].replace(':', '')}_{name}_{uuid.uuid4().hex[:8]}.json")
+    try:
+        os.makedirs(directory, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+    except OSError as e:
+        logger.warning(f"Could not write import metrics to {path}: {e}")
+        return None
+    return path
+
+
+# ==========================
+# PROFILING
+# ==========================
+class Profiler:
+    """cProfile over several threads: each thread profiles the calls it runs
+    through run(), and dump() merges them into one pstats file."""
+
+    def __init__(self):
+        self.profiles = []
+        self.lock = threading.Lock()
+
+    def run(self, func, *args):
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # another profiler is already active in this thread
+            return func(*args)
+        try:
+            return func(*args)
+        finally:
+            profile.disable()
+            with self.lock:
+                self.profiles.append(profile)
+
+    def dump(self, path):
+        with self.lock:
+            if not self.profiles:
+                return
+            stats = pstats.Stats(self.profiles[0])
+            for profile in self.profiles[1:]:
+                stats.add(profile)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        stats.dump_stats(path)
+        logger.info(f"Profile written to {path}")
+
+
+# ==========================
+# PROCESS-WIDE TOTALS (Prometheus)
+# ==========================
+_totals = {
+    "runs": {},            # status -> count
+    "seconds": 0.0,
+    "stage_seconds": {},   # (sheet, stage) -> seconds; sheet "" for whole-import stages
+    "rows": {},            # (sheet, kind) -> rows
+    "round_trips": {},     # sheet -> count
+    "bytes_sent": {},      # sheet -> bytes
+}
+_totals_lock = threading.Lock()
+
+
+def record(summary):
+    """Add a finished import's summary to the process-wide totals."""
+    with _totals_lock:
+        runs = _totals["runs"]
+        runs[summary["status"]] = runs.get(summary["status"], 0) + 1
+        _totals["seconds"] += summary["duration"]
+        stage_seconds = _totals["stage_seconds"]
+        for stage, seconds in summary["stages"].items():
+            stage_seconds[("", stage)] = stage_seconds.get(("", stage), 0.0) + seconds
+        for sheet, data in summary["sheets"].items():
+            for stage, seconds in data["stages"].items():
+                stage_seconds[(sheet, stage)] = stage_seconds.get((sheet, stage), 0.0) + seconds
+            for kind in ("rows_in", "rows_dropped_fk", "rows_skipped", "rows_out", "rows_replayed"):
+                key = (sheet, kind[len("rows_"):])
+                _totals["rows"][key] = _totals["rows"].get(key, 0) + data[kind]
+            for name in ("round_trips", "bytes_sent"):
+                _totals[name][sheet] = _totals[name].get(sheet, 0) + data[name]
+
+
+def _labels(**labels):
+    return "{" + ",".join(f'{k}="{v}"' for k, v in labels.items()) + "}" if labels else ""
+
+
+def _metric(lines, name, kind, help_text, samples):
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} {kind}")
+    for labels, value in samples:
+        lines.append(f"{name}{_labels(**labels)} {value}")
+
+
+POOL_GAUGES = ("size", "open", "in_use", "idle")
+
+
+def prometheus_text(pool=None):
+    """Totals of all imports finished in this process (and the connection pool
+    metrics, if given) in the Prometheus text exposition format."""
+    with _totals_lock:
+        totals = copy.deepcopy(_totals)
+    lines = []
+    _metric(lines, "import_runs_total", "counter", "Imports finished, by outcome.",
+            [({"status": status}, count) for status, count in totals["runs"].items()])
+    _metric(lines, "import_seconds_total", "counter", "Wall time spent in imports.",
+            [({}, round(totals["seconds"], 4))])
+    _metric(lines, "import_stage_seconds_total", "counter",
+            "Time spent per sheet and stage (sheet is empty for whole-import stages).",
+            [({"sheet": sheet, "stage": stage}, round(seconds, 4))
+             for (sheet, stage), seconds in totals["stage_seconds"].items()])
+    _metric(lines, "import_rows_total", "counter",
+            "Rows per sheet: read (in), dropped by FK rules, skipped as unchanged, written (out) "
+            "and written again after a lost connection (replayed).",
+            [({"sheet": sheet, "kind": kind}, rows) for (sheet, kind), rows in totals["rows"].items()])
+    _metric(lines, "import_db_round_trips_total", "counter", "Statements and commits sent per sheet.",
+            [({"sheet": sheet}, count) for sheet, count in totals["round_trips"].items()])
+    _metric(lines, "import_db_bytes_sent_total", "counter", "SQL and LOAD DATA bytes sent per sheet.",
+            [({"sheet": sheet}, count) for sheet, count in totals["bytes_sent"].items()])
+    for name, value in (pool or {}).items():
+        if name in POOL_GAUGES:
+            _metric(lines, f"db_pool_{name}", "gauge", f"Connection pool {name.replace('_', ' ')}.", [({}, value)])
+        else:
+            _metric(lines, f"db_pool_{name}_total", "counter", f"Connection pool {name.replace('_', ' ')}.",
+                    [({}, value)])
+    return "\n".join(lines) + "\n"
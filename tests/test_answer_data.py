@@ -0,0 +1,84 @@
+"""The answer_data decoder against the phpserialize / regex path it replaced."""
+import os
+import random
+
+import openpyxl
+import pytest
+
+from import_utils import _phpserialize_answer_data, answer_cell_json, convert_answer_data, decode_answer_options
+from synthetic import synthetic_answer_data, synthetic_option_texts
+
+EXPORT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "uploads",
+                      "Health_Assessment_v.1.0.xlsx")
+
+
+def fallback_answer_data(s):
+    return _phpserialize_answer_data(s, {"questionType": "MCQ", "totalPoints": 0, "options": []})
+
+
+def answer_lists(seed, multibyte):
+    rng = random.Random(seed)
+    for _ in range(300):
+        texts = synthetic_option_texts(rng, rng.randint(1, 6), multibyte)
+        yield texts, synthetic_answer_data(rng, texts=texts)
+
+
+@pytest.mark.parametrize("multibyte", [False, True])
+def test_decoder_reads_every_option_text_exactly(multibyte):
+    for texts, s in answer_lists(1, multibyte):
+        assert decode_answer_options(s) is not None
+        assert [o["text"] for o in convert_answer_data(s)["options"]] == texts
+
+
+def test_same_as_fallback_on_ascii_lists():
+    for _, s in answer_lists(2, False):
+        assert s.isascii()
+        assert convert_answer_data(s) == fallback_answer_data(s)
+
+
+def test_same_as_fallback_on_a_course_export():
+    wb = openpyxl.load_workbook(EXPORT, read_only=True)
+    try:
+        rows = wb["questions"].iter_rows(values_only=True)
+        column = next(rows).index("answer_data")
+        cells = [row[column] for row in rows if row[column]]
+    finally:
+        wb.close()
+    assert cells
+    for s in cells:
+        result = convert_answer_data(s)
+        assert result["options"]
+        if s.isascii():
+            assert result == fallback_answer_data(s.strip())
+
+
+def mutate(rng, s):
+    b = s.encode()
+    for _ in range(rng.randint(1, 3)):
+        op, i = rng.randint(0, 4), rng.randrange(len(b) + 1)
+        if op == 0:
+            b = b[:i]
+        elif op == 1:
+            b = b[:i] + b[i + 1:]
+        elif op == 2:
+            b = b[:i] + bytes([rng.choice(b'0123456789:;"{}sNaOibd')]) + b[i:]
+        elif op == 3:
+            b = b[:i] + b[i + 1:i + 2] + b[i:i + 1] + b[i + 2:]
+        else:
+            b += rng.choice([b" ", b";", b"N;", b"}"])
+    return b.decode("utf-8", "replace")
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_damaged_lists_still_convert(seed):
+    rng = random.Random(seed)
+    for _, s in answer_lists(seed, rng.random() < 0.5):
+        damaged = mutate(rng, s)
+        result = convert_answer_data(damaged)
+        assert set(result) >= {"questionType", "totalPoints", "options"}
+        assert result["totalPoints"] == sum(o["points"] for o in result["options"])
+        options = decode_answer_options(damaged.strip())
+        if options:
+            # the decoder only takes lists it reads completely
+            assert [o["text"] for o in result["options"]] == [text for text, _, _ in options]
+        answer_cell_json(damaged)
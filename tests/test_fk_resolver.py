@@ -0,0 +1,42 @@
+"""FkResolver queries: ids written by the run or looked up before are not sent
+to the server again."""
+from types import SimpleNamespace
+
+from import_utils import FkResolver, add_written_ids
+
+
+class CountingCursor:
+    def __init__(self, existing):
+        self.existing = existing
+        self.queries = []
+        self.result = []
+
+    def execute(self, query, params=None):
+        self.queries.append(list(params))
+        self.result = [(v,) for v in params if v in self.existing]
+
+    def fetchall(self):
+        return self.result
+
+
+def session(existing):
+    return SimpleNamespace(cursor=CountingCursor(existing))
+
+
+def test_each_id_is_looked_up_once():
+    db = session({1, 2})
+    resolver = FkResolver(db)
+    assert resolver.resolve("lessons", "lesson_id", [1, 3]) == {1}
+    assert resolver.resolve("lessons", "lesson_id", [1.0, "3", 2]) == {1, 2}
+    assert db.cursor.queries == [[1, 3], [2]]
+
+
+def test_written_ids_need_no_query():
+    db = session(set())
+    resolver = FkResolver(db)
+    add_written_ids(resolver, "lessons", ["lesson_id", "title"], [("7", "a"), (8, "b"), (None, "c")])
+    add_written_ids(resolver, "editors", ["name"], [("x",)])
+    assert resolver.resolve("lessons", "lesson_id", [7, 8]) == {7, 8}
+    assert db.cursor.queries == []
+    assert resolver.resolve("lessons", "lesson_id", [7, 9]) == {7, 8}
+    assert db.cursor.queries == [[9]]
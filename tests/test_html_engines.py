@@ -0,0 +1,65 @@
+"""Golden-file corpus for the HTML engines.
+
+Every fixture under fixtures/html has the blocks the BeautifulSoup path
+produces stored next to it as JSON; each engine in HTML_ENGINES must produce
+exactly those.  Fixtures under malformed/ hold markup libxml2 repairs its own
+way (see html_engines), so lxml is not held to them.  lxml is a test
+requirement (requirements-dev.txt): without it the lxml cases are skipped and
+test_lxml_is_installed fails.  After a deliberate change to the blocks,
+regenerate the goldens from the bs4 engine, from the repository root, with
+
+    python -m tests.test_html_engines
+"""
+import glob
+import importlib.util
+import json
+import os
+
+import pytest
+
+from import_utils import HTML_ENGINES, html_to_block_json, strip_gutenberg
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "html")
+HTML_FILES = sorted(glob.glob(os.path.join(FIXTURES, "**", "*.html"), recursive=True))
+
+
+def blocks(path, engine):
+    with open(path, encoding="utf-8") as f:
+        return html_to_block_json(strip_gutenberg(f.read()), engine)
+
+
+def golden(path):
+    with open(os.path.splitext(path)[0] + ".json", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def fixture_id(path):
+    return os.path.relpath(path, FIXTURES)
+
+
+def test_lxml_is_installed():
+    assert importlib.util.find_spec("lxml") is not None, \
+        "lxml is missing, so the lxml engine is not tested: pip install -r requirements-dev.txt"
+
+
+def test_corpus_is_present():
+    assert HTML_FILES
+    assert any(os.sep + "malformed" + os.sep in path for path in HTML_FILES)
+
+
+@pytest.mark.parametrize("engine", sorted(HTML_ENGINES))
+@pytest.mark.parametrize("path", HTML_FILES, ids=fixture_id)
+def test_engine_matches_golden(path, engine):
+    if engine == "lxml":
+        pytest.importorskip("lxml")
+        if os.sep + "malformed" + os.sep in path:
+            pytest.skip("libxml2 repairs malformed markup differently")
+    assert blocks(path, engine) == golden(path)
+
+
+if __name__ == "__main__":
+    for path in HTML_FILES:
+        with open(os.path.splitext(path)[0] + ".json", "w", encoding="utf-8") as f:
+            json.dump(blocks(path, "bs4"), f, ensure_ascii=False, indent=2)
+            f.write("\n")
+        print(f"wrote {fixture_id(path)}")
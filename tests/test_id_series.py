@@ -0,0 +1,71 @@
+"""to_id_series against the per-cell int(float(v)) the FK checks used, on
+random id columns of every dtype read_excel produces."""
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from import_utils import to_id_series
+
+SEEDS = range(200)
+
+TEXT_IDS = [" 12 ", "12", "12.7", "-3", "1e3", "1_000", "١٢", "１２", "0x10", "abc", "", "nan", "inf", "-inf",
+            "9007199254740993"]
+
+
+def per_cell_id(v):
+    if v is None or (isinstance(v, float) and v != v):
+        return None
+    try:
+        return int(float(v))
+    except (ValueError, TypeError, OverflowError):
+        return None
+
+
+def random_value(rng, kind):
+    if rng.random() < 0.15:
+        return rng.choice([None, np.nan])
+    if kind == "int":
+        return rng.randint(-10 ** 6, 10 ** 6)
+    if kind == "float":
+        return rng.choice([rng.uniform(-1e6, 1e6), float(rng.randint(-1000, 1000)), 2.0 ** rng.randint(50, 70),
+                           float("inf"), -0.0])
+    if kind == "str":
+        return rng.choice(TEXT_IDS)
+    return rng.choice([rng.randint(0, 1000), rng.uniform(0, 1000), rng.choice(TEXT_IDS), True])
+
+
+def random_column(rng, kind):
+    values = [random_value(rng, kind) for _ in range(rng.randint(0, 40))]
+    if kind == "int" and None not in values and not any(isinstance(v, float) for v in values):
+        return pd.Series(values, dtype="int64")
+    if kind == "float":
+        return pd.Series([np.nan if v is None else v for v in values], dtype="float64")
+    return pd.Series(values, dtype=object)
+
+
+def expected_ids(series):
+    return [None if per_cell_id(v) is None else float(per_cell_id(v)) for v in series]
+
+
+def actual_ids(series):
+    return [None if v != v else float(v) for v in to_id_series(series)]
+
+
+@pytest.mark.parametrize("kind", ["int", "float", "str", "mixed"])
+def test_to_id_series_matches_per_cell(kind):
+    rng = random.Random(kind)
+    for _ in SEEDS:
+        series = random_column(rng, kind)
+        assert actual_ids(series) == expected_ids(series), list(series)
+
+
+def test_text_float_accepts():
+    series = pd.Series(["1_000", "١٢", "１２", " 7 "], dtype=object)
+    assert actual_ids(series) == [1000.0, 12.0, 12.0, 7.0]
+
+
+def test_string_dtype():
+    series = pd.Series(["12", "1_000", None, "x"], dtype="string")
+    assert actual_ids(series) == [12.0, 1000.0, None, None]
@@ -0,0 +1,71 @@
+from import_utils import RowFingerprints, record_fingerprints, split_unchanged_rows
+
+COLUMNS = ["id", "name"]
+KEY = [0]
+
+
+def incremental_import(fingerprints, rows, table):
+    """What import_sheet does with one chunk: write the rows that changed (as
+    upserts, in order) and record the fingerprints of those written."""
+    counts = {"inserted": 0, "updated": 0, "skipped": 0}
+    keep = split_unchanged_rows(fingerprints, "editors", COLUMNS, KEY, rows, counts)
+    written = [rows[i] for i in keep]
+    for row in written:
+        table[row[0]] = row
+    record_fingerprints(fingerprints, "editors", COLUMNS, KEY, written)
+    return counts
+
+
+def test_repeated_key_keeps_the_last_row():
+    fingerprints = RowFingerprints(path=":memory:", scope="test")
+    rows = [(1, "first"), (2, "other"), (1, "second")]
+    table = {}
+    results = [(incremental_import(fingerprints, rows, table), dict(table)) for _ in range(3)]
+    full = {1: (1, "second"), 2: (2, "other")}
+    assert [t for _, t in results] == [full, full, full]
+    assert results[0][0] == {"inserted": 2, "updated": 0, "skipped": 1}
+    assert results[1][0] == results[2][0] == {"inserted": 0, "updated": 0, "skipped": 3}
+
+
+def test_changed_and_new_rows_are_written():
+    fingerprints = RowFingerprints(path=":memory:", scope="test")
+    table = {}
+    incremental_import(fingerprints, [(1, "a"), (2, "b")], table)
+    counts = incremental_import(fingerprints, [(1, "a"), (2, "changed"), (3, "new"), (None, "no key")], table)
+    assert counts == {"inserted": 2, "updated": 1, "skipped": 1}
+    assert table == {1: (1, "a"), 2: (2, "changed"), 3: (3, "new"), None: (None, "no key")}
+
+
+def chunked_import(fingerprints, chunks, table):
+    """incremental_import over the chunks of one sheet, as import_sheet does
+    with IMPORT_CHUNK_SIZE."""
+    counts = {"inserted": 0, "updated": 0, "skipped": 0, "repeated": 0}
+    seen = set()
+    for rows in chunks:
+        keep = split_unchanged_rows(fingerprints, "editors", COLUMNS, KEY, rows, counts, seen)
+        written = [rows[i] for i in keep]
+        for row in written:
+            table[row[0]] = row
+        record_fingerprints(fingerprints, "editors", COLUMNS, KEY, written)
+    return counts
+
+
+def test_key_repeated_across_chunks():
+    fingerprints = RowFingerprints(path=":memory:", scope="test")
+    chunks = [[(1, "first"), (2, "other")], [(3, "third"), (1, "second")]]
+    table = {}
+    results = [(chunked_import(fingerprints, chunks, table), dict(table)) for _ in range(3)]
+    full = {1: (1, "second"), 2: (2, "other"), 3: (3, "third")}
+    assert [t for _, t in results] == [full, full, full]
+    assert results[0][0] == {"inserted": 3, "updated": 1, "skipped": 0, "repeated": 1}
+    # the earlier row differs from the last one recorded, so both are written again
+    assert results[1][0] == results[2][0] == {"inserted": 0, "updated": 2, "skipped": 2, "repeated": 1}
+
+
+def test_chunks_without_repeated_keys_match_a_whole_read():
+    rows = [(i, f"row {i}") for i in range(10)] + [(4, "again")]
+    whole, chunked = RowFingerprints(path=":memory:", scope="a"), RowFingerprints(path=":memory:", scope="b")
+    for _ in range(2):
+        counts = incremental_import(whole, rows, {})
+        chunk_counts = chunked_import(chunked, [rows[:3], rows[3:]], {})
+        assert chunk_counts == dict(counts, repeated=0)
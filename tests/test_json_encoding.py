@@ -0,0 +1,61 @@
+import json
+import random
+
+import pytest
+
+from import_utils import (answer_cell_json, content_cell_json, content_to_json, convert_answer_data, dump_json,
+                          parse_json, NOT_JSON)
+from synthetic import synthetic_answer_data, synthetic_html
+
+
+def stored(obj):
+    # how converted cells have always been written
+    return json.dumps(obj, ensure_ascii=False)
+
+
+@pytest.mark.parametrize("obj", [
+    {"content": []},
+    {"content": [{"type": "paragraph", "children": [{"type": "text", "text": "Größe 日本語 😀 \"q\" \\ \n"}]}]},
+    [1, -0.0, 0.1, 1e16, 1e-7, 2 ** 70, -2 ** 63 - 1, True, None],
+    {"nan": float("nan"), "inf": float("inf"), "": {"nested": [[], {}]}},
+    "plain string",
+    42,
+])
+def test_dump_json_writes_the_stored_form(obj):
+    assert dump_json(obj) == stored(obj)
+
+
+def test_converted_cells_match_the_stored_form():
+    rng = random.Random(7)
+    for _ in range(200):
+        html = synthetic_html(rng, rng.randint(1, 8))
+        assert content_cell_json(html) == stored(content_to_json(html))
+        answers = synthetic_answer_data(rng, rng.randint(1, 6))
+        assert answer_cell_json(answers) == stored(convert_answer_data(answers))
+
+
+@pytest.mark.parametrize("cell", [
+    '{"content":[]}',
+    '{"content": [{"type": "paragraph", "children": [{"type": "text", "text": "x"}]}]}',
+    ' {"content" :[ {"type":"paragraph","children":[]} ], "extra": 1.50} ',
+    '{"content":[{"type":"text","text":"caf\\u00e9"}]}',
+])
+def test_block_json_is_stored_in_canonical_form(cell):
+    assert content_cell_json(cell) == stored(json.loads(cell))
+
+
+@pytest.mark.parametrize("cell", ['[1,2]', '"text"', '12', '{"blocks":[]}', '{"content":"x"}'])
+def test_other_json_is_encoded_again(cell):
+    assert content_cell_json(cell) == stored(json.loads(cell))
+
+
+@pytest.mark.parametrize("cell", [None, "", "<p>x</p>", "plain text", "{not json", "NaN "])
+def test_empty_and_non_json_cells(cell):
+    assert content_cell_json(cell) == stored(content_to_json(cell))
+
+
+def test_parse_json():
+    assert parse_json('{"a": [1]}') == {"a": [1]}
+    assert parse_json("<p>x</p>") is NOT_JSON
+    assert parse_json(None) is NOT_JSON
+    assert parse_json("[" * 100000) is NOT_JSON